@@ -6,52 +6,497 @@ import subprocess
 import threading
 import shutil
 import signal
-import psutil
-from pathlib import Path, WindowsPath
+import fnmatch
+import re
+import shlex
+import bisect
+import hashlib
+import struct
+import importlib
+from collections import deque
+from dataclasses import dataclass, asdict, fields
+from pathlib import Path
 from datetime import datetime
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
-import win32api
-import win32con
-import win32file
 import logging
 
+# Heavy modules are loaded only when used, so short commands like status
+# start quickly: asyncio and concurrent.futures through the stand-ins below,
+# watchdog and pywin32 where they are needed.
+
+class _LazyModule:
+    """Stands in for a module and imports it on first attribute access"""
+    def __init__(self, name):
+        self._name = name
+    
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        # Later lookups hit the instance dict and skip __getattr__
+        self.__dict__.update(vars(module))
+        return getattr(module, attr)
+
+asyncio = _LazyModule('asyncio')
+futures = _LazyModule('concurrent.futures')
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
-class WindowsGitBackupHandler(FileSystemEventHandler):
-    def __init__(self, project_path, backup_interval=300):
-        self.project_path = Path(project_path)
-        self.backup_interval = backup_interval
+# Directories never descended into while looking for nested repositories
+PRUNED_DIRS = {
+    'node_modules', '__pycache__', 'bin', 'obj', 'dist', 'build',
+    '$RECYCLE.BIN', 'System Volume Information'
+}
+
+DEFAULT_IGNORE_PATTERNS = (
+    '.git', '__pycache__', '.DS_Store', 'node_modules', '.env',
+    'Thumbs.db', 'desktop.ini', '.vscode', '.idea', 'bin', 'obj',
+    '.vs', '*.tmp', '*.temp', '*.log', '.sass-cache', 'dist', 'build'
+)
+
+# Scratch files editors write around an atomic save (Office owner and
+# ~WRL/~WRD files, vim swap and backup files, emacs locks, LibreOffice locks);
+# the editor_temp_patterns setting replaces this list
+EDITOR_TEMP_PATTERNS = (
+    '~$*', '~*.tmp', '*.tmp', '*.temp', '*.~tmp', '*.swp', '*.swo', '*.swx',
+    '*~', '.#*', '4913', '.~lock.*#', '*.crswap'
+)
+
+@dataclass(frozen=True)
+class BackupConfig:
+    """Validated daemon settings, replaced as a whole when the file changes"""
+    backup_interval: int = 300
+    auto_push: bool = True
+    max_file_size_mb: int = 100
+    excluded_extensions: tuple = ('.exe', '.dll', '.bin', '.iso')
+    ignore_patterns: tuple = tuple(p.lower() for p in DEFAULT_IGNORE_PATTERNS)
+    projects_path: str = ''
+    project_roots: tuple = ()
+    max_parallel_repos: int = 4
+    parallel_stage_threshold: int = 1000
+    adaptive_throttling: bool = True
+    coalesce_window_ms: int = 300
+    replication_targets: tuple = ()
+    bundle_consolidate_every: int = 20
+    native_watch_max_files: int = 100000
+    max_git_processes: int = 0
+    editor_temp_patterns: tuple = tuple(p.lower() for p in EDITOR_TEMP_PATTERNS)
+    
+    _LIMITS = {
+        'backup_interval': (10, 86400),
+        'max_file_size_mb': (0, 1024 * 1024),
+        'max_parallel_repos': (1, 64),
+        'parallel_stage_threshold': (1, 10 ** 9),
+        'coalesce_window_ms': (0, 10000),
+        'bundle_consolidate_every': (1, 10000),
+        'native_watch_max_files': (0, 10 ** 9),
+        'max_git_processes': (0, 256),
+    }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Build a config from parsed JSON, raising ValueError on bad values"""
+        if not isinstance(data, dict):
+            raise ValueError("config must be a JSON object")
+        
+        values = {}
+        errors = []
+        for f in fields(cls):
+            if f.name not in data:
+                continue
+            value = data[f.name]
+            if f.type is bool:
+                if not isinstance(value, bool):
+                    errors.append(f"{f.name} must be true or false")
+            elif f.type is int:
+                if isinstance(value, bool) or not isinstance(value, int):
+                    errors.append(f"{f.name} must be an integer")
+                else:
+                    low, high = cls._LIMITS[f.name]
+                    if not low <= value <= high:
+                        errors.append(f"{f.name} must be between {low} and {high}")
+            elif f.type is str:
+                if not isinstance(value, str):
+                    errors.append(f"{f.name} must be a string")
+            elif f.type is tuple:
+                if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+                    errors.append(f"{f.name} must be a list of strings")
+                else:
+                    value = tuple(value)
+            values[f.name] = value
+        
+        if 'excluded_extensions' in values and not errors:
+            extensions = tuple(ext.lower() for ext in values['excluded_extensions'] if ext)
+            bad = [ext for ext in extensions if not re.fullmatch(r'\.[\w.+-]+', ext)]
+            if bad:
+                errors.append(f"excluded_extensions has invalid entries: {', '.join(bad)}")
+            values['excluded_extensions'] = extensions
+        for key in ('ignore_patterns', 'editor_temp_patterns'):
+            if key in values and not errors:
+                values[key] = tuple(p.lower() for p in values[key] if p)
+        
+        if errors:
+            raise ValueError('; '.join(errors))
+        return cls(**values)
+    
+    def to_dict(self):
+        return {key: list(value) if isinstance(value, tuple) else value
+                for key, value in asdict(self).items()}
+
+SNAPSHOT_INDEX = 'backup_snapshots.jsonl'
+# Larger commits (branch switches, mass renames) are looked up in git instead
+SNAPSHOT_MAX_FILES = 200
+# Fixed-size (commit time, commit id) records, bisected on disk by restore
+SNAPSHOT_TIMES = 'backup_snapshot_times.bin'
+SNAPSHOT_TIME_RECORD = struct.Struct('<q20s')
+
+# A full SHA-1 or SHA-256 object name
+OBJECT_ID = re.compile(r'[0-9a-f]{40}|[0-9a-f]{64}')
+
+# Lets the replay harness drive the same code on Linux
+CREATE_NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+GIT_CACHE_FILE = Path(os.environ.get('LOCALAPPDATA') or Path.home()) / 'GitBackup' / 'git_discovery.json'
+
+# Backup attempts are logged here as structured records, see AuditLog
+AUDIT_LOGGER = 'git_backup.audit'
+
+def data_directory(user_profile):
+    """Per-user state that has no business on the (often synced) Desktop"""
+    return Path(user_profile) / 'AppData' / 'Local' / 'GitBackup'
+
+def audit_directory(user_profile):
+    return data_directory(user_profile) / 'audit'
+
+def owned_by_current_account(path):
+    """Whether git's ownership check would accept path for the account running this process"""
+    # Missing folders are reported by the prerequisite check
+    if sys.platform != 'win32':
+        try:
+            return os.stat(path).st_uid == os.geteuid()
+        except OSError:
+            return True
+    import win32api
+    import win32security
+    try:
+        owner = win32security.GetFileSecurity(
+            str(path), win32security.OWNER_SECURITY_INFORMATION).GetSecurityDescriptorOwner()
+    except win32security.error:
+        return True
+    token = win32security.OpenProcessToken(win32api.GetCurrentProcess(), win32security.TOKEN_QUERY)
+    if owner == win32security.GetTokenInformation(token, win32security.TokenUser)[0]:
+        return True
+    # Like git, accept folders an elevated administrator created
+    admins = win32security.CreateWellKnownSid(win32security.WinBuiltinAdministratorsSid)
+    return owner == admins and bool(win32security.CheckTokenMembership(None, admins))
+
+# Project folders are writable by their users, so the service never runs
+# the hooks or fsmonitor program a repository's config points at
+SERVICE_GIT_OVERRIDES = ('core.hooksPath=/dev/null', 'core.fsmonitor=false')
+
+# Modules that must not be loaded just to run a short command
+HEAVY_MODULES = ('asyncio', 'concurrent.futures', 'watchdog', 'win32api', 'win32file', 'psutil')
+
+def _locate_git_bash():
+    possible_paths = [
+        r"C:\Program Files\Git\bin\bash.exe",
+        r"C:\Program Files (x86)\Git\bin\bash.exe",
+        r"C:\Git\bin\bash.exe",
+        shutil.which("bash")
+    ]
+    
+    for path in possible_paths:
+        if path and Path(path).exists():
+            logging.info(f"Found Git Bash at: {path}")
+            return path
+    
+    git_exe = shutil.which("git")
+    if git_exe:
+        bash_path = Path(git_exe).parent / "bash.exe"
+        if bash_path.exists():
+            return str(bash_path)
+    
+    raise FileNotFoundError("Git Bash not found. Please install Git for Windows.")
+
+def find_git(refresh=False):
+    """Locate Git Bash and the git version, cached on disk until git is updated"""
+    if not refresh:
+        try:
+            with open(GIT_CACHE_FILE, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if (os.stat(cached['git']).st_mtime_ns == cached['git_mtime']
+                    and Path(cached['bash']).exists()):
+                return cached
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    
+    bash = _locate_git_bash()
+    git = Path(bash).with_name('git.exe')
+    git = str(git) if git.exists() else shutil.which('git') or bash
+    result = subprocess.run([bash, '-c', 'git --version'],
+                            check=True, capture_output=True, text=True,
+                            creationflags=CREATE_NO_WINDOW)
+    info = {
+        'bash': bash,
+        'git': git,
+        'git_mtime': os.stat(git).st_mtime_ns,
+        'version': result.stdout.strip(),
+    }
+    try:
+        GIT_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(GIT_CACHE_FILE, 'w', encoding='utf-8') as f:
+            json.dump(info, f, indent=2)
+    except OSError as e:
+        logging.warning(f"Could not cache git location: {e}")
+    return info
+
+def _bash_path(path):
+    """Windows path in the /c/... form Git Bash expects"""
+    return re.sub(r'^([A-Za-z]):', lambda m: '/' + m.group(1).lower(), str(path).replace('\\', '/'))
+
+def parse_time(text):
+    """Parse an ISO date/time or an age such as 30m, 2h or 3d into a timestamp"""
+    match = re.fullmatch(r'(\d+)\s*([smhdw])', text.strip().lower())
+    if match:
+        unit = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}[match.group(2)]
+        return time.time() - int(match.group(1)) * unit
+    return datetime.fromisoformat(text.strip()).timestamp()
+
+def path_matches(path, pattern):
+    pattern = pattern.replace('\\', '/').strip('/')
+    if any(char in pattern for char in '*?['):
+        return fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(path.rsplit('/', 1)[-1], pattern)
+    return path == pattern or path.endswith('/' + pattern) or path.startswith(pattern + '/')
+
+class ChangeJournal:
+    """Paths changed in one repo since its last backup, with change times"""
+    def __init__(self):
+        self.paths = set()
+        self.first_change = None
+        self.last_change = None
+    
+    def add(self, path, when):
+        self.paths.add(path)
+        if self.first_change is None or when < self.first_change:
+            self.first_change = when
+        if self.last_change is None or when > self.last_change:
+            self.last_change = when
+
+class ResourceGovernor:
+    """Samples CPU, disk I/O and battery and scales backup work to match"""
+    LEVELS = ('idle', 'busy', 'strained')
+    CPU_PERCENT = (50, 85)
+    DISK_MB_PER_SEC = (30, 100)
+    LOW_BATTERY_PERCENT = 20
+    
+    def __init__(self, interval=5.0):
+        import psutil
+        self.psutil = psutil
+        self.interval = interval
+        self.level = 0
+        self.cpu_percent = 0.0
+        self.disk_mb_per_sec = 0.0
+        self.battery_percent = None
+        self.on_battery = False
+        self.level_changes = 0
+        self.sampled_at = None
+        self._last_io = None
+        psutil.cpu_percent(interval=None)
+    
+    def sample(self):
+        """Take one reading; returns True when the pressure level changed"""
+        psutil = self.psutil
+        now = time.monotonic()
+        self.cpu_percent = psutil.cpu_percent(interval=None)
+        
+        io = psutil.disk_io_counters()
+        if io is not None:
+            total = io.read_bytes + io.write_bytes
+            if self._last_io:
+                last_total, last_time = self._last_io
+                self.disk_mb_per_sec = (total - last_total) / max(now - last_time, 1e-6) / (1024 * 1024)
+            self._last_io = (total, now)
+        
+        battery = psutil.sensors_battery() if hasattr(psutil, 'sensors_battery') else None
+        self.battery_percent = battery.percent if battery else None
+        self.on_battery = bool(battery and not battery.power_plugged)
+        self.sampled_at = time.time()
+        
+        target = 0
+        if (self.cpu_percent >= self.CPU_PERCENT[1] or self.disk_mb_per_sec >= self.DISK_MB_PER_SEC[1]
+                or (self.on_battery and self.battery_percent < self.LOW_BATTERY_PERCENT)):
+            target = 2
+        elif (self.cpu_percent >= self.CPU_PERCENT[0] or self.disk_mb_per_sec >= self.DISK_MB_PER_SEC[0]
+                or self.on_battery):
+            target = 1
+        
+        # Back off at once, recover one level per sample so a short lull is not full speed
+        level = target if target > self.level else max(target, self.level - 1)
+        changed = level != self.level
+        if changed:
+            logging.info(f"System {self.LEVELS[level]} (cpu {self.cpu_percent:.0f}%, "
+                         f"disk {self.disk_mb_per_sec:.1f} MB/s"
+                         f"{', on battery' if self.on_battery else ''}), adjusting backups")
+            self.level = level
+            self.level_changes += 1
+        return changed
+    
+    def parallel_budget(self, limit):
+        return max(1, limit >> self.level)
+    
+    def interval_factor(self):
+        return (1, 2, 4)[self.level]
+    
+    def creation_flags(self):
+        if self.level == 0:
+            return 0
+        return getattr(subprocess, ('BELOW_NORMAL_PRIORITY_CLASS', 'IDLE_PRIORITY_CLASS')[self.level - 1], 0)
+    
+    def lower_priority(self, pid):
+        """Lower CPU and I/O priority of a freshly started git process"""
+        if self.level == 0:
+            return
+        psutil = self.psutil
+        try:
+            process = psutil.Process(pid)
+            if sys.platform == 'win32':
+                process.ionice(psutil.IOPRIO_LOW if self.level == 1 else psutil.IOPRIO_VERYLOW)
+            else:
+                process.nice(10 if self.level == 1 else 19)
+                if self.level == 1:
+                    process.ionice(psutil.IOPRIO_CLASS_BE, 7)
+                else:
+                    process.ionice(psutil.IOPRIO_CLASS_IDLE)
+        except (psutil.Error, OSError, AttributeError, ValueError):
+            pass
+    
+    def metrics(self):
+        return {
+            'level': self.LEVELS[self.level],
+            'cpu_percent': self.cpu_percent,
+            'disk_mb_per_sec': round(self.disk_mb_per_sec, 2),
+            'battery_percent': self.battery_percent,
+            'on_battery': self.on_battery,
+            'interval_factor': self.interval_factor(),
+            'level_changes': self.level_changes,
+            'sampled_at': self.sampled_at,
+        }
+
+class FairSlots:
+    """Git process slots shared by the profiles of one service
+    
+    A freed slot goes to the waiting profile that holds the fewest, so a
+    profile with a thousand busy repos cannot starve one with a single
+    change, and each profile can be capped with max_git_processes.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.in_use = {}
+        self.waiters = {}
+    
+    def for_profile(self, name, quota):
+        """Context manager for one profile, quota is a callable returning its cap (0 for none)"""
+        return ProfileSlots(self, name, quota)
+    
+    async def acquire(self, name, quota):
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(name, deque()).append((future, quota))
+        self._grant()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted just as we were cancelled
+                self.release(name)
+            elif (future, quota) in self.waiters[name]:
+                # _grant drops cancelled waiters itself, so it may be gone already
+                self.waiters[name].remove((future, quota))
+            raise
+    
+    def release(self, name):
+        self.in_use[name] -= 1
+        self._grant()
+    
+    def _grant(self):
+        while sum(self.in_use.values()) < self.capacity:
+            ready = [name for name, queue in self.waiters.items()
+                     if queue and (not queue[0][1] or self.in_use.get(name, 0) < queue[0][1])]
+            if not ready:
+                return
+            name = min(ready, key=lambda name: self.in_use.get(name, 0))
+            future, _ = self.waiters[name].popleft()
+            if future.cancelled():
+                continue
+            self.in_use[name] = self.in_use.get(name, 0) + 1
+            future.set_result(None)
+    
+    def metrics(self):
+        return {
+            'capacity': self.capacity,
+            'in_use': {name: count for name, count in self.in_use.items() if count},
+            'waiting': {name: len(queue) for name, queue in self.waiters.items() if queue},
+        }
+
+class ProfileSlots:
+    """One profile's view of FairSlots, used like the semaphore it replaces"""
+    def __init__(self, slots, name, quota):
+        self.slots = slots
+        self.name = name
+        self.quota = quota
+    
+    async def __aenter__(self):
+        await self.slots.acquire(self.name, self.quota())
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self.slots.release(self.name)
+
+class WindowsGitBackupHandler:
+    # Load readings change every sample; on their own they refresh the metrics file this often
+    METRICS_REFRESH = 60
+    
+    def __init__(self, project_roots, config=None):
+        if isinstance(project_roots, (str, Path)):
+            project_roots = [project_roots]
+        self.project_roots = [Path(root).resolve() for root in project_roots]
+        self.repos = set()
+        self.config = config or BackupConfig()
         self.pending_changes = {}
         self.last_backup = {}
         self.running = False
         self.backup_thread = None
+        self.loop = None
+        self.main_task = None
+        self.main_future = None
+        self.wake = None
+        self.git_slots = None
+        self.git_env = None
+        self.git_overrides = ()
+        self.governor = None
+        self.shared_governor = False
+        self.metrics_file = None
+        self.metrics_written = (None, 0)
+        self.recorder = None
+        self.backup_listener = None
+        self.watch_supervisor = None
+        self.polled_repos = ()
+        self.audit_log = None
+        self.backup_requested = False
+        self.backup_running = False
         self.git_bash_path = self._find_git_bash()
         self.lock = threading.Lock()
         self.file_locks = {}
+        self.repo_locks = {}
+        self.staged = {}
+        self.flush_handle = None
+        self.coalesce_stats = {'raw_events': 0, 'dropped_events': 0, 'logical_changes': 0, 'lock_probes': 0}
         
     def _find_git_bash(self):
-        possible_paths = [
-            r"C:\Program Files\Git\bin\bash.exe",
-            r"C:\Program Files (x86)\Git\bin\bash.exe",
-            r"C:\Git\bin\bash.exe",
-            shutil.which("bash")
-        ]
-        
-        for path in possible_paths:
-            if path and Path(path).exists():
-                logging.info(f"Found Git Bash at: {path}")
-                return path
-        
-        git_exe = shutil.which("git")
-        if git_exe:
-            bash_path = Path(git_exe).parent / "bash.exe"
-            if bash_path.exists():
-                return str(bash_path)
-        
-        raise FileNotFoundError("Git Bash not found. Please install Git for Windows.")
+        return find_git()['bash']
     
     def _is_file_locked(self, filepath):
+        self.coalesce_stats['lock_probes'] += 1
+        if sys.platform != 'win32':
+            # Only Windows has share-mode locks worth waiting for
+            return False
+        import win32api
+        import win32file
         try:
             handle = win32file.CreateFile(
                 filepath, win32file.GENERIC_READ, 0, None,
@@ -62,87 +507,236 @@ class WindowsGitBackupHandler(FileSystemEventHandler):
         except:
             return True
     
-    def _wait_for_file_unlock(self, filepath, max_wait=10):
-        start_time = time.time()
-        while time.time() - start_time < max_wait:
+    async def _wait_for_file_unlock(self, filepath, max_wait=10):
+        deadline = time.monotonic() + max_wait
+        while time.monotonic() < deadline:
             if not self._is_file_locked(filepath):
                 return True
-            time.sleep(0.1)
+            await asyncio.sleep(0.1)
         return False
     
+    def dispatch(self, event):
+        # Watchdog calls this on its own thread; all handling runs on the event loop
+        if self.recorder:
+            self.recorder.write(event)
+        loop = self.loop
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(self._dispatch, event)
+        else:
+            self._dispatch(event)
+    
+    def _dispatch(self, event):
+        # Repos too large to watch have their own poller, so the root watch's events for them are noise
+        polled = self.polled_repos
+        if polled and all(path.startswith(polled) for path in
+                          (event.src_path, getattr(event, 'dest_path', None) or event.src_path)):
+            return
+        # Same routing as watchdog's FileSystemEventHandler, without importing it
+        handler = getattr(self, f'on_{event.event_type}', None)
+        if handler:
+            handler(event)
+    
     def on_modified(self, event):
-        if event.is_directory or self._is_ignored(event.src_path):
+        if not event.is_directory:
+            self._stage_change(event.src_path)
+    
+    def _is_editor_temp(self, path):
+        name = os.path.basename(path).lower()
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in self.config.editor_temp_patterns)
+    
+    def _coalesce_window(self):
+        window = self.config.coalesce_window_ms / 1000
+        return window * self.governor.interval_factor() if self.governor else window
+    
+    def _stage_change(self, filepath):
+        # A save is usually several events (temp write, renames, backup delete);
+        # buffer them per path so each save costs one existence check and lock probe
+        self.coalesce_stats['raw_events'] += 1
+        if self._is_editor_temp(filepath) or self._is_ignored(filepath):
+            self.coalesce_stats['dropped_events'] += 1
             return
         
-        if self._is_file_locked(event.src_path):
-            threading.Thread(target=self._handle_locked_file, 
-                           args=(event.src_path,), daemon=True).start()
-        else:
-            self._add_pending_change(event.src_path)
+        now = time.time()
+        first = self.staged[filepath][0] if filepath in self.staged else now
+        self.staged[filepath] = (first, now)
+        
+        window = self._coalesce_window()
+        loop = self.loop
+        if not window or loop is None or not loop.is_running():
+            self._flush_staged(force=True)
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(window, self._flush_staged)
+    
+    def _flush_staged(self, force=False):
+        self.flush_handle = None
+        window = self._coalesce_window()
+        now = time.time()
+        for filepath, (first, last) in list(self.staged.items()):
+            if not force and now - last < window:
+                continue
+            del self.staged[filepath]
+            self.coalesce_stats['logical_changes'] += 1
+            
+            # Deletions and temp-to-target renames settle here, so gone files skip the probe
+            if not os.path.exists(filepath) or not self._is_file_locked(filepath):
+                self._add_pending_change(filepath, first)
+            elif filepath not in self.file_locks:
+                # One waiter task per file, however many events it produces
+                self.file_locks[filepath] = self.loop.create_task(
+                    self._handle_locked_file(filepath, first))
+        
+        if self.staged:
+            quiet_at = min(last for _, last in self.staged.values()) + window
+            self.flush_handle = self.loop.call_later(max(quiet_at - now, 0.01), self._flush_staged)
     
-    def _handle_locked_file(self, filepath):
-        if self._wait_for_file_unlock(filepath):
-            self._add_pending_change(filepath)
+    async def _handle_locked_file(self, filepath, when):
+        try:
+            if await self._wait_for_file_unlock(filepath):
+                self._add_pending_change(filepath, when)
+        finally:
+            self.file_locks.pop(filepath, None)
     
-    def _add_pending_change(self, filepath):
+    def _add_pending_change(self, filepath, when=None):
         repo_path = self._get_repo_path(filepath)
         if repo_path:
             with self.lock:
                 if repo_path not in self.pending_changes:
-                    self.pending_changes[repo_path] = set()
-                self.pending_changes[repo_path].add(filepath)
+                    self.pending_changes[repo_path] = ChangeJournal()
+                self.pending_changes[repo_path].add(filepath, when or time.time())
     
     def on_created(self, event):
+        if event.is_directory and Path(event.src_path).name == '.git':
+            repo_path = Path(event.src_path).parent.resolve()
+            if repo_path not in self.repos:
+                with self.lock:
+                    self.repos.add(repo_path)
+                logging.info(f"Discovered new repository: {repo_path}")
+            return
         self.on_modified(event)
     
     def on_deleted(self, event):
-        if not event.is_directory:
-            repo_path = self._get_repo_path(event.src_path)
-            if repo_path:
-                with self.lock:
-                    if repo_path not in self.pending_changes:
-                        self.pending_changes[repo_path] = set()
-                    self.pending_changes[repo_path].add(event.src_path)
+        self.on_modified(event)
     
     def on_moved(self, event):
         if not event.is_directory:
-            self._add_pending_change(event.dest_path)
-            repo_path = self._get_repo_path(event.src_path)
-            if repo_path:
-                with self.lock:
-                    if repo_path not in self.pending_changes:
-                        self.pending_changes[repo_path] = set()
-                    self.pending_changes[repo_path].add(event.src_path)
+            self._stage_change(event.dest_path)
+            self._stage_change(event.src_path)
+    
+    def on_overflow(self, event):
+        # The OS dropped events somewhere under this folder, so none of them can be trusted
+        logging.warning(f"File events were lost under {event.src_path}, rescanning it")
+        if self.watch_supervisor:
+            self.watch_supervisor.stats['overflows'] += 1
+        self.request_rescan(event.src_path)
+    
+    def request_rescan(self, path):
+        """Back up every repo under path on the next cycle, letting git status find the changes"""
+        path = Path(path).resolve()
+        now = time.time()
+        with self.lock:
+            repos = [repo for repo in self.repos if repo == path or path in repo.parents] or [path]
+            for repo_path in repos:
+                if repo_path not in self.pending_changes:
+                    self.pending_changes[repo_path] = ChangeJournal()
+                self.pending_changes[repo_path].add(str(repo_path), now)
     
     def _is_ignored(self, path):
-        ignore_patterns = [
-            '.git', '__pycache__', '.DS_Store', 'node_modules', '.env',
-            'Thumbs.db', 'desktop.ini', '.vscode', '.idea', 'bin', 'obj',
-            '.vs', '*.tmp', '*.temp', '*.log', '.sass-cache', 'dist', 'build'
-        ]
-        path_str = str(path).lower()
-        return any(pattern.lower() in path_str for pattern in ignore_patterns)
+        config = self.config
+        parts = self._relative_parts(path)
+        if not parts:
+            return False
+        if parts[-1].lower().endswith(config.excluded_extensions):
+            return True
+        return any(fnmatch.fnmatchcase(part.lower(), pattern)
+                   for part in parts for pattern in config.ignore_patterns)
+    
+    def _relative_parts(self, path):
+        path = Path(path)
+        for root in self.project_roots:
+            try:
+                return path.relative_to(root).parts
+            except ValueError:
+                continue
+        return path.parts
+    
+    def apply_config(self, config):
+        """Swap in a new config; workers pick it up at their next step"""
+        self.config = config
+        self._wake_scheduler()
+    
+    def _wake_scheduler(self):
+        loop, wake = self.loop, self.wake
+        if loop is not None and wake is not None and loop.is_running():
+            loop.call_soon_threadsafe(wake.set)
     
     def _get_repo_path(self, file_path):
         try:
             path = Path(file_path).resolve()
+            roots = self.project_roots
+            # Nearest parent wins, so nested repos take their own changes
             for parent in path.parents:
-                if parent.parent == self.project_path.resolve():
+                if parent in self.repos or parent.parent in roots:
                     return parent
         except (OSError, ValueError):
             pass
         return None
     
-    def _run_git_command(self, cmd, repo_path, timeout=60):
+    def _scan_dir(self, directory):
+        repos, subdirs = [], []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.name == '.git':
+                        repos.append(Path(directory))
+                    elif (entry.is_dir(follow_symlinks=False)
+                          and not entry.name.startswith('.')
+                          and entry.name not in PRUNED_DIRS):
+                        subdirs.append(entry.path)
+        except OSError:
+            pass
+        return repos, subdirs
+    
+    def discover_repos(self):
+        """Find every repo under the project roots with a pruned parallel scan"""
+        repos = set()
+        for root in self.project_roots:
+            if root.exists():
+                repos.update(d.resolve() for d in root.iterdir()
+                             if d.is_dir() and not d.name.startswith('.'))
+        
+        with futures.ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as pool:
+            pending = {pool.submit(self._scan_dir, root) for root in self.project_roots}
+            while pending:
+                done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    found, subdirs = future.result()
+                    repos.update(path.resolve() for path in found)
+                    pending.update(pool.submit(self._scan_dir, d) for d in subdirs)
+        
+        with self.lock:
+            self.repos = repos
+        return sorted(repos)
+    
+    def set_project_roots(self, project_roots):
+        self.project_roots = [Path(root).resolve() for root in project_roots]
+        return self.discover_repos()
+    
+    def _bash_command(self, cmd, repo_path):
+        # Convert Windows path to Unix-style for Git Bash
+        bash_cmd = f'cd "{_bash_path(repo_path)}" && {cmd}'
+        if self.git_overrides:
+            # A shell function, so every git in a pipeline gets the -c options too
+            options = ' '.join(f'-c {shlex.quote(option)}' for option in self.git_overrides)
+            bash_cmd = f'git() {{ command git {options} "$@"; }}; {bash_cmd}'
+        return bash_cmd
+    
+    def _run_git_command(self, cmd, repo_path, timeout=60, input=None):
         try:
-            # Convert Windows path to Unix-style for Git Bash
-            unix_path = str(repo_path).replace('\\', '/').replace('C:', '/c')
-            bash_cmd = f'cd "{unix_path}" && {cmd}'
-            
             result = subprocess.run(
-                [self.git_bash_path, '-c', bash_cmd],
-                capture_output=True, text=True, timeout=timeout,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                [self.git_bash_path, '-c', self._bash_command(cmd, repo_path)],
+                capture_output=True, text=True, encoding='utf-8', errors='replace',
+                input=input, timeout=timeout, env=self.git_env,
+                creationflags=CREATE_NO_WINDOW
             )
             return result
         except subprocess.TimeoutExpired:
@@ -152,16 +746,61 @@ class WindowsGitBackupHandler(FileSystemEventHandler):
             logging.error(f"Git command failed in {repo_path}: {e}")
             return None
     
-    def _ensure_git_repo(self, repo_path):
+    async def _git(self, cmd, repo_path, timeout=60, input=None):
+        """Run a git command on the event loop, same result shape as _run_git_command"""
+        if self.git_slots is None:
+            self.git_slots = asyncio.Semaphore((os.cpu_count() or 1) * 2)
+        
+        args = [self.git_bash_path, '-c', self._bash_command(cmd, repo_path)]
+        governor = self.governor
+        async with self.git_slots:
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *args,
+                    stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=self.git_env,
+                    creationflags=CREATE_NO_WINDOW | (governor.creation_flags() if governor else 0)
+                )
+            except OSError as e:
+                logging.error(f"Git command failed in {repo_path}: {e}")
+                return None
+            if governor:
+                governor.lower_priority(process.pid)
+            
+            try:
+                stdout, stderr = await asyncio.wait_for(
+                    process.communicate(input.encode('utf-8') if input is not None else None), timeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"Git command timed out in {repo_path}")
+                process.kill()
+                await process.wait()
+                return None
+            except asyncio.CancelledError:
+                process.kill()
+                raise
+        
+        return subprocess.CompletedProcess(args, process.returncode,
+                                           stdout.decode('utf-8', errors='replace'),
+                                           stderr.decode('utf-8', errors='replace'))
+    
+    def _start_git_process(self, cmd, repo_path):
+        """Start a long-running git command with binary pipes for streaming"""
+        return subprocess.Popen(
+            [self.git_bash_path, '-c', self._bash_command(cmd, repo_path)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=self.git_env,
+            creationflags=CREATE_NO_WINDOW
+        )
+    
+    async def _ensure_git_repo(self, repo_path):
         git_dir = repo_path / '.git'
         if git_dir.exists():
             return True
         
         try:
-            result = self._run_git_command('git init', repo_path)
+            result = await self._git('git init', repo_path)
             if result and result.returncode == 0:
                 self._create_gitignore(repo_path)
-                self._set_git_config(repo_path)
+                await self._set_git_config(repo_path)
                 return True
         except Exception as e:
             logging.error(f"Failed to initialize git repo in {repo_path}: {e}")
@@ -198,98 +837,1567 @@ build/
 .sass-cache/
 """
         try:
-            gitignore = repo_path / '.gitignore'
-            if not gitignore.exists():
-                gitignore.write_text(gitignore_content, encoding='utf-8')
-        except Exception as e:
-            logging.warning(f"Could not create .gitignore in {repo_path}: {e}")
+            gitignore = repo_path / '.gitignore'
+            if not gitignore.exists():
+                gitignore.write_text(gitignore_content, encoding='utf-8')
+        except Exception as e:
+            logging.warning(f"Could not create .gitignore in {repo_path}: {e}")
+    
+    async def _set_git_config(self, repo_path):
+        configs = [
+            'git config core.autocrlf true',
+            'git config core.filemode false',
+            'git config core.ignorecase true'
+        ]
+        for config in configs:
+            await self._git(config, repo_path, timeout=10)
+    
+    def _parse_porcelain(self, output):
+        """Parse `git status --porcelain -z` into (path, deleted) pairs"""
+        changes = []
+        entries = output.split('\0')
+        i = 0
+        while i < len(entries):
+            entry = entries[i]
+            i += 1
+            if len(entry) < 4:
+                continue
+            status, path = entry[:2], entry[3:]
+            if status[0] in 'RC':
+                # Renames carry the original path as the next entry
+                changes.append((entries[i], True))
+                i += 1
+            # Nested repositories show up as untracked directories
+            if path.endswith('/') or '\n' in path:
+                continue
+            changes.append((path, 'D' in status))
+        return changes
+    
+    async def _hash_shard(self, repo_path, paths):
+        result = await self._git('git hash-object -w --stdin-paths', repo_path,
+                                       timeout=300, input='\n'.join(paths) + '\n')
+        if not result or result.returncode != 0:
+            return None
+        shas = result.stdout.split()
+        if len(shas) != len(paths):
+            return None
+        return shas
+    
+    async def _stage_parallel(self, repo_path, changes, config):
+        """Hash changed files in parallel shards and stage them in one index update"""
+        to_hash = [path for path, deleted in changes
+                   if not deleted and not path.lower().endswith(config.excluded_extensions)]
+        deleted = [path for path, deleted in changes if deleted]
+        # hash-object follows symlinks, so links go through git add, which stores them as links
+        links = [path for path in to_hash if os.path.islink(repo_path / path)]
+        if links:
+            link_set = set(links)
+            to_hash = [path for path in to_hash if path not in link_set]
+        
+        # Keep the recorded mode of tracked files (core.filemode is false)
+        modes = {}
+        stage_result = await self._git('git ls-files --stage -z', repo_path, timeout=120)
+        if stage_result and stage_result.returncode == 0:
+            for entry in stage_result.stdout.split('\0'):
+                if '\t' in entry:
+                    info, path = entry.split('\t', 1)
+                    modes[path] = info.split(' ', 1)[0]
+        
+        # Each shard is its own git process, so hashing spreads over all cores
+        workers = os.cpu_count() or 1
+        shard_size = max(256, -(-len(to_hash) // workers))
+        shards = [to_hash[i:i + shard_size] for i in range(0, len(to_hash), shard_size)]
+        
+        results = await asyncio.gather(*(self._hash_shard(repo_path, shard) for shard in shards))
+        
+        if any(shas is None for shas in results):
+            return False
+        
+        records = []
+        for shard, shas in zip(shards, results):
+            for path, sha in zip(shard, shas):
+                # A link replaced by a regular file loses its link mode
+                mode = modes.get(path, '100644')
+                records.append(f"{'100644' if mode == '120000' else mode} {sha}\t{path}")
+        for path in deleted:
+            records.append(f"0 {'0' * 40}\t{path}")
+        
+        index_result = await self._git('git update-index -z --index-info', repo_path,
+                                             timeout=300, input='\0'.join(records) + '\0')
+        if not index_result or index_result.returncode != 0:
+            return False
+        if links:
+            add_result = await self._git('git add -A --pathspec-from-file=- --pathspec-file-nul', repo_path,
+                                         timeout=300, input=''.join(f':(literal){path}\0' for path in links))
+            return bool(add_result and add_result.returncode == 0)
+        return True
+    
+    async def _staged_summary(self, repo_path):
+        """Paths, per-extension counts, line counts and bytes written and removed of what is staged"""
+        diff_result = await self._git('git diff --cached --raw --numstat -z --no-renames --no-abbrev', repo_path)
+        if not diff_result or diff_result.returncode != 0:
+            return None
+        
+        # Raw entries (":meta", path) come first, then one "added<TAB>removed<TAB>path" per file
+        entries = iter(diff_result.stdout.split('\0'))
+        changes = []
+        lines_added = lines_removed = binary = 0
+        for entry in entries:
+            if entry.startswith(':'):
+                info = entry.split()
+                path = next(entries, '')
+                if len(info) >= 4:
+                    changes.append((path, info[2], info[3]))
+            elif entry.count('\t') >= 2:
+                added, removed, _ = entry.split('\t', 2)
+                if added.isdigit() and removed.isdigit():
+                    lines_added += int(added)
+                    lines_removed += int(removed)
+                else:
+                    binary += 1
+        
+        # Full size of every new and replaced blob, so a same-size edit still counts
+        null_sha = '0' * 40
+        shas = {sha for _, old, new in changes for sha in (old, new) if sha != null_sha}
+        sizes = {}
+        if shas:
+            check_result = await self._git('git cat-file --batch-check', repo_path,
+                                                 input='\n'.join(shas) + '\n')
+            if check_result and check_result.returncode == 0:
+                for line in check_result.stdout.splitlines():
+                    parts = line.split()
+                    if len(parts) == 3 and parts[2].isdigit():
+                        sizes[parts[0]] = int(parts[2])
+        
+        extensions = {}
+        for path, _, _ in changes:
+            ext = Path(path).suffix.lower() or '(none)'
+            extensions[ext] = extensions.get(ext, 0) + 1
+        
+        return {
+            'paths': [path for path, _, _ in changes],
+            'extensions': extensions,
+            'lines_added': lines_added,
+            'lines_removed': lines_removed,
+            'binary_files': binary,
+            'bytes_written': sum(sizes.get(new, 0) for _, _, new in changes),
+            'bytes_removed': sum(sizes.get(old, 0) for _, old, _ in changes),
+        }
+    
+    def _commit_message(self, summary, journal):
+        lines = [f"Auto backup - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", '']
+        if journal and journal.first_change:
+            lines.append(f"Backup-First-Change: {datetime.fromtimestamp(journal.first_change).isoformat(timespec='seconds')}")
+            lines.append(f"Backup-Last-Change: {datetime.fromtimestamp(journal.last_change).isoformat(timespec='seconds')}")
+        counts = ', '.join(f"{ext}={count}" for ext, count in
+                           sorted(summary['extensions'].items(), key=lambda item: (-item[1], item[0])))
+        lines.append(f"Backup-Files: {len(summary['paths'])} ({counts})")
+        lines.append(f"Backup-Lines-Added: {summary['lines_added']}")
+        lines.append(f"Backup-Lines-Removed: {summary['lines_removed']}")
+        if summary['binary_files']:
+            lines.append(f"Backup-Binary-Files: {summary['binary_files']}")
+        lines.append(f"Backup-Bytes-Written: {summary['bytes_written']}")
+        lines.append(f"Backup-Bytes-Removed: {summary['bytes_removed']}")
+        return '\n'.join(lines) + '\n'
+    
+    async def _record_snapshot(self, repo_path, summary, journal):
+        """Append the new commit to the side index used by the find command"""
+        git_dir = repo_path / '.git'
+        head_result = await self._git('git log -1 --format=%H%x20%ct', repo_path)
+        if not git_dir.is_dir() or not head_result or head_result.returncode != 0:
+            return
+        
+        commit, commit_time = head_result.stdout.split()
+        record = {
+            'commit': commit,
+            'time': int(commit_time),
+            'first': journal.first_change if journal else None,
+            'last': journal.last_change if journal else None,
+            'file_count': len(summary['paths']),
+            'files': summary['paths'] if len(summary['paths']) <= SNAPSHOT_MAX_FILES else None,
+        }
+        times_file = self._snapshot_times(repo_path)
+        try:
+            with open(git_dir / SNAPSHOT_INDEX, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            with open(times_file, 'ab') as f:
+                f.write(SNAPSHOT_TIME_RECORD.pack(record['time'], bytes.fromhex(commit)))
+        except OSError as e:
+            logging.warning(f"Could not update snapshot index in {repo_path}: {e}")
+    
+    def _snapshot_times(self, repo_path):
+        """Time index of the snapshot index, rebuilt from it when missing"""
+        git_dir = repo_path / '.git'
+        times_file = git_dir / SNAPSHOT_TIMES
+        if git_dir.is_dir() and not times_file.exists():
+            try:
+                with open(times_file, 'wb') as f:
+                    for snapshot in self.read_snapshots(repo_path):
+                        f.write(SNAPSHOT_TIME_RECORD.pack(snapshot['time'], bytes.fromhex(snapshot['commit'])))
+            except (OSError, ValueError, struct.error) as e:
+                logging.warning(f"Could not build snapshot time index in {repo_path}: {e}")
+        return times_file
+    
+    def read_snapshots(self, repo_path):
+        index_file = repo_path / '.git' / SNAPSHOT_INDEX
+        if not index_file.exists():
+            return []
+        
+        snapshots = []
+        with open(index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    snapshots.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return snapshots
+    
+    def snapshot_files(self, repo_path, snapshot):
+        """Paths changed by a snapshot, asking git when the index left them out"""
+        if snapshot.get('files') is not None:
+            return snapshot['files']
+        result = self._run_git_command(
+            f"git diff-tree --root --no-commit-id --no-renames --name-only -r -z {snapshot['commit']}", repo_path)
+        if not result or result.returncode != 0:
+            return []
+        return [path for path in result.stdout.split('\0') if path]
+    
+    def resolve_snapshot(self, repo_path, at):
+        """Latest backup commit made at or before the given timestamp"""
+        record = SNAPSHOT_TIME_RECORD
+        try:
+            with open(self._snapshot_times(repo_path), 'rb') as f:
+                # Appended in commit order, so it is already sorted
+                low, high = 0, os.fstat(f.fileno()).st_size // record.size
+                while low < high:
+                    middle = (low + high) // 2
+                    f.seek(middle * record.size)
+                    if record.unpack(f.read(record.size))[0] <= at:
+                        low = middle + 1
+                    else:
+                        high = middle
+                if low:
+                    f.seek((low - 1) * record.size)
+                    commit_time, commit = record.unpack(f.read(record.size))
+                    return commit.hex(), commit_time
+        except OSError:
+            pass
+        
+        # Older history predates the index, ask git directly
+        result = self._run_git_command(f'git log -1 --format=%H%x20%ct --before={int(at)} HEAD', repo_path)
+        if result and result.returncode == 0 and result.stdout.strip():
+            commit, commit_time = result.stdout.split()
+            return commit, int(commit_time)
+        return None, None
+    
+    def list_snapshot_files(self, repo_path, commit, path):
+        result = self._run_git_command(
+            f'git ls-tree -r -z --full-tree {commit} -- {shlex.quote(path)}', repo_path)
+        if not result or result.returncode != 0:
+            return []
+        
+        entries = []
+        for entry in result.stdout.split('\0'):
+            if '\t' not in entry:
+                continue
+            info, entry_path = entry.split('\t', 1)
+            mode, kind, sha = info.split()
+            # Submodules have no blob to restore
+            if kind == 'blob':
+                entries.append((entry_path, sha))
+        return entries
+    
+    def _stream_blobs(self, repo_path, entries, destination, crlf):
+        """Write blobs to disk through one git cat-file --batch process"""
+        process = self._start_git_process('git cat-file --batch', repo_path)
+        
+        def feed():
+            try:
+                for _, sha in entries:
+                    process.stdin.write(f"{sha}\n".encode('ascii'))
+                process.stdin.close()
+            except OSError:
+                pass
+        
+        writer = threading.Thread(target=feed, daemon=True)
+        writer.start()
+        restored = 0
+        try:
+            for entry_path, sha in entries:
+                header = process.stdout.readline().split()
+                if len(header) != 3:
+                    logging.warning(f"Cannot read {entry_path} from {sha}")
+                    continue
+                
+                remaining = int(header[2])
+                target = destination / entry_path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                temp_file = target.with_name(target.name + '.restore-tmp')
+                # Mirror checkout with core.autocrlf, which leaves a blob alone
+                # if a NUL or CR appears anywhere in it
+                text = crlf
+                with open(temp_file, 'wb') as f:
+                    while remaining:
+                        chunk = process.stdout.read(min(remaining, 1024 * 1024))
+                        if not chunk:
+                            raise IOError("git cat-file ended early")
+                        remaining -= len(chunk)
+                        if text and (b'\0' in chunk or b'\r' in chunk):
+                            text = False
+                        f.write(chunk)
+                process.stdout.read(1)
+                if text:
+                    self._convert_to_crlf(temp_file)
+                os.replace(temp_file, target)
+                restored += 1
+        finally:
+            process.stdout.close()
+            process.wait()
+            writer.join()
+        return restored
+    
+    def _convert_to_crlf(self, path):
+        converted = path.with_name(path.name + '.crlf')
+        with open(path, 'rb') as source, open(converted, 'wb') as f:
+            while True:
+                chunk = source.read(1024 * 1024)
+                if not chunk:
+                    break
+                f.write(chunk.replace(b'\n', b'\r\n'))
+        os.replace(converted, path)
+    
+    def restore(self, repo_path, commit, path, destination, workers=None):
+        """Restore a file or directory from a commit without checking it out"""
+        entries = self.list_snapshot_files(repo_path, commit, path)
+        if not entries:
+            return 0
+        
+        crlf_result = self._run_git_command('git config --get core.autocrlf', repo_path, timeout=10)
+        crlf = bool(crlf_result and crlf_result.stdout.strip() == 'true')
+        
+        workers = min(workers or os.cpu_count() or 1, max(1, len(entries) // 64))
+        if workers == 1:
+            return self._stream_blobs(repo_path, entries, destination, crlf)
+        
+        shards = [entries[i::workers] for i in range(workers)]
+        with futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(lambda shard: self._stream_blobs(repo_path, shard, destination, crlf),
+                                shards))
+    
+    async def _backup_repo(self, repo_path, config=None, journal=None, attempt=None):
+        config = config or self.config
+        attempt = attempt if attempt is not None else {}
+        steps = attempt.setdefault('steps', {})
+        started = time.monotonic()
+        
+        def step(name):
+            nonlocal started
+            now = time.monotonic()
+            steps[name] = round(now - started, 3)
+            started = now
+        
+        if not await self._ensure_git_repo(repo_path):
+            attempt.update(result='failed', error='could not initialize repository')
+            return False
+        
+        try:
+            # Check if there are changes
+            status_result = await self._git('git status --porcelain -z --untracked-files=all', repo_path)
+            step('status')
+            if status_result and status_result.returncode != 0:
+                # e.g. git's dubious ownership check on a repo owned by another account
+                logging.error(f"git status failed in {repo_path}: {status_result.stderr.strip()}")
+                attempt.update(result='failed', error='git status failed')
+                return False
+            if not status_result or not status_result.stdout.strip():
+                attempt['result'] = 'clean'
+                return True
+            
+            # Large change sets are hashed in parallel, everything else goes through git add
+            changes = self._parse_porcelain(status_result.stdout)
+            staged = False
+            if len(changes) >= config.parallel_stage_threshold:
+                staged = await self._stage_parallel(repo_path, changes, config)
+                if not staged:
+                    logging.warning(f"Parallel staging failed in {repo_path}, falling back to git add")
+            
+            if not staged:
+                excludes = ''.join(f" ':(exclude,glob,icase)**/*{ext}'" for ext in config.excluded_extensions)
+                add_result = await self._git(f'git add -A -- .{excludes}', repo_path)
+                if not add_result or add_result.returncode != 0:
+                    logging.error(f"Failed to add files in {repo_path}")
+                    attempt.update(result='failed', error='git add failed')
+                    return False
+            step('stage')
+            
+            # Excluded files can leave nothing to commit
+            summary = await self._staged_summary(repo_path)
+            step('summary')
+            if summary is not None and not summary['paths']:
+                attempt['result'] = 'clean'
+                return True
+            if summary is None:
+                summary = {'paths': [], 'extensions': {}, 'lines_added': 0, 'lines_removed': 0,
+                           'binary_files': 0, 'bytes_written': 0, 'bytes_removed': 0}
+            attempt.update(files=len(summary['paths']), bytes=summary['bytes_written'])
+            
+            # Create commit, with trailers describing the change window
+            commit_msg = self._commit_message(summary, journal)
+            commit_result = await self._git('git commit -q -F -', repo_path, input=commit_msg)
+            if not commit_result or commit_result.returncode != 0:
+                logging.error(f"Failed to commit in {repo_path}")
+                attempt.update(result='failed', error='git commit failed')
+                return False
+            await self._record_snapshot(repo_path, summary, journal)
+            step('commit')
+            attempt['result'] = 'committed'
+            
+            # Try to push if remote exists
+            remote_result = await self._git('git remote', repo_path) if config.auto_push else None
+            if remote_result and remote_result.stdout.strip():
+                push_result = await self._git('git push', repo_path, timeout=30)
+                step('push')
+                if push_result and push_result.returncode != 0:
+                    logging.warning(f"Push failed for {repo_path}: {push_result.stderr}")
+                    attempt['push_failed'] = True
+            
+            logging.info(f"Backup completed for {repo_path.name}")
+            return True
+            
+        except Exception as e:
+            logging.error(f"Backup failed for {repo_path}: {e}")
+            attempt.update(result='failed', error=str(e))
+            return False
+    
+    def _audit(self, repo_path, journal, success, attempt, duration):
+        if not self.audit_log:
+            return
+        record = {
+            'time': round(time.time(), 3),
+            'repo': str(repo_path),
+            'result': attempt.get('result', 'committed' if success else 'failed'),
+            'duration': round(duration, 3),
+            'files': attempt.get('files', 0),
+            'bytes': attempt.get('bytes', 0),
+            'changes': len(journal.paths) if journal else None,
+            'steps': attempt.get('steps', {}),
+        }
+        for key in ('error', 'push_failed'):
+            if key in attempt:
+                record[key] = attempt[key]
+        # Written by the log listener thread, never on the event loop
+        logging.getLogger(AUDIT_LOGGER).info('backup attempt', extra={'audit': record, 'audit_log': self.audit_log})
+    
+    def _replica_dir(self, repo_path, target):
+        # Name for humans browsing the drive, hash so same-named repos never collide
+        digest = hashlib.sha1(str(repo_path).lower().encode('utf-8')).hexdigest()[:8]
+        return Path(os.path.expandvars(target)).expanduser() / f'{repo_path.name}-{digest}'
+    
+    async def _replicate_to(self, repo_path, target, config):
+        """Write the commits not yet on the target as the next bundle in its chain"""
+        root = Path(os.path.expandvars(target)).expanduser()
+        if not root.is_dir():
+            # Removable drives come and go, the next backup catches up
+            logging.debug(f"Replication target {target} is not available")
+            return 'unavailable'
+        
+        result = await self._git('git for-each-ref --format="%(objectname) %(refname)" refs/heads refs/tags',
+                                 repo_path)
+        if not result or result.returncode != 0:
+            return 'failed'
+        refs = {}
+        for line in result.stdout.splitlines():
+            sha, _, ref = line.partition(' ')
+            if ref:
+                refs[ref] = sha
+        if not refs:
+            return 'empty'
+        
+        replica = self._replica_dir(repo_path, target)
+        state_file = replica / 'replication.json'
+        state = self._read_replication_state(state_file)
+        if state['refs'] == refs:
+            return 'current'
+        
+        replica.mkdir(parents=True, exist_ok=True)
+        sequence = state['sequence'] + 1
+        full = not state['refs'] or sequence - state['full'] >= config.bundle_consolidate_every
+        
+        async def create_bundle(kind, exclude):
+            bundle = replica / f'{sequence:06d}-{kind}.bundle'
+            # git writes through a lock file, so a bundle is either complete or absent
+            excludes = ''.join(f' ^{sha}' for sha in sorted(set(exclude)))
+            result = await self._git(f'git bundle create -q "{_bash_path(bundle)}" --branches --tags{excludes}',
+                                     repo_path, timeout=3600)
+            return bundle, result
+        
+        bundle, result = await create_bundle('full' if full else 'incr',
+                                             () if full else state['refs'].values())
+        if result and result.returncode != 0 and not full:
+            if 'empty bundle' in result.stderr:
+                # Only refs moved backwards or were deleted, there is nothing new to copy
+                state['refs'] = refs
+                self._write_replication_state(state_file, state)
+                return 'current'
+            # History was rewritten or pruned, so start a new chain
+            full = True
+            bundle, result = await create_bundle('full', ())
+        if not result or result.returncode != 0:
+            logging.warning(f"Replication of {repo_path.name} to {target} failed: "
+                            f"{result.stderr.strip() if result else 'git did not run'}")
+            return 'failed'
+        
+        state.update(sequence=sequence, refs=refs, repo=str(repo_path), updated=time.time())
+        if full:
+            state['full'] = sequence
+        self._write_replication_state(state_file, state)
+        
+        if full:
+            # Consolidated: older links of the chain are no longer needed
+            for old in replica.glob('*.bundle'):
+                if old != bundle:
+                    try:
+                        old.unlink()
+                    except OSError as e:
+                        logging.warning(f"Could not remove old bundle {old}: {e}")
+        logging.info(f"Replicated {repo_path.name} to {bundle} ({bundle.stat().st_size / 1024:.1f} KB)")
+        return 'full' if full else 'incremental'
+    
+    def _read_replication_state(self, state_file):
+        """Load a target's chain state; anything unexpected starts a new full chain"""
+        fresh = {'sequence': 0, 'full': 0, 'refs': {}}
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return fresh
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable {state_file}: {e}")
+            return fresh
+        
+        # The file sits on removable or shared media and its SHAs end up in a git command line
+        valid = (isinstance(state, dict)
+                 and all(type(state.get(key)) is int and state[key] >= 0 for key in ('sequence', 'full'))
+                 and isinstance(state.get('refs'), dict)
+                 and all(isinstance(ref, str) and isinstance(sha, str) and OBJECT_ID.fullmatch(sha)
+                         for ref, sha in state['refs'].items()))
+        if not valid:
+            logging.warning(f"Ignoring malformed {state_file}, starting a new full bundle chain")
+            return fresh
+        return state
+    
+    def _write_replication_state(self, state_file, state):
+        temp_file = state_file.with_name(state_file.name + '.tmp')
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_file, state_file)
+    
+    async def replicate(self, repo_path, config=None, targets=None):
+        """Bring every replication target up to date with the repo, in parallel"""
+        config = config or self.config
+        targets = targets or config.replication_targets
+        
+        async def replicate_to(target):
+            try:
+                return await self._replicate_to(repo_path, target, config)
+            except Exception as e:
+                # One bad target must not stop the others or the backup that triggered it
+                logging.warning(f"Replication of {repo_path.name} to {target} failed: {e}")
+                return 'failed'
+        
+        results = await asyncio.gather(*(replicate_to(target) for target in targets))
+        return dict(zip(targets, results))
+    
+    async def backup_repos(self, journals, config=None):
+        """Back up repos as one task each, bounded by the parallel-repo budget"""
+        config = config or self.config
+        budget = config.max_parallel_repos
+        if self.governor:
+            budget = self.governor.parallel_budget(budget)
+        semaphore = asyncio.Semaphore(budget)
+        
+        async def backup(repo_path, journal):
+            success = False
+            # Auditing, replication and listeners run outside _backup_repo's own
+            # handler; a failure there must not take the scheduler down with it
+            try:
+                async with semaphore:
+                    # A repo is never backed up twice at once (scheduler and manual runs)
+                    lock = self.repo_locks.setdefault(repo_path, asyncio.Lock())
+                    async with lock:
+                        attempt = {}
+                        started = time.monotonic()
+                        success = await self._backup_repo(repo_path, config, journal, attempt)
+                        self._audit(repo_path, journal, success, attempt, time.monotonic() - started)
+                        if success and config.replication_targets:
+                            await self.replicate(repo_path, config)
+                if success:
+                    self.last_backup[str(repo_path)] = datetime.now()
+                if self.backup_listener:
+                    self.backup_listener(repo_path, journal, success)
+            except Exception as e:
+                logging.error(f"Post-backup work failed for {repo_path}: {e}")
+            return success
+        
+        repos = [repo_path for repo_path in journals if repo_path.exists()]
+        results = await asyncio.gather(*(backup(repo_path, journals[repo_path]) for repo_path in repos))
+        return dict(zip(repos, results))
+    
+    async def _backup_cycle(self):
+        # One config snapshot per cycle, so a reload never mixes settings mid-backup
+        config = self.config
+        repos_to_backup = {}
+        
+        with self.lock:
+            if self.pending_changes:
+                repos_to_backup = self.pending_changes.copy()
+                self.pending_changes.clear()
+        
+        if repos_to_backup:
+            self.backup_running = True
+            try:
+                await self.backup_repos(repos_to_backup, config)
+            finally:
+                self.backup_running = False
+    
+    async def _scheduler(self):
+        loop = asyncio.get_running_loop()
+        while self.running:
+            last_run = loop.time()
+            self.backup_requested = False
+            try:
+                await self._backup_cycle()
+            except Exception as e:
+                logging.error(f"Backup cycle failed, retrying next interval: {e}")
+            
+            # Config and load changes wake the wait so a new interval applies right away
+            while self.running and not self.backup_requested:
+                interval = self.config.backup_interval
+                if self.governor:
+                    interval *= self.governor.interval_factor()
+                remaining = last_run + interval - loop.time()
+                if remaining <= 0:
+                    break
+                self.wake.clear()
+                try:
+                    await asyncio.wait_for(self.wake.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+    
+    async def _govern(self):
+        psutil_missing = False
+        last_error = None
+        while self.running:
+            try:
+                # A service samples one governor for all of its profiles
+                if not self.shared_governor:
+                    if self.config.adaptive_throttling and not self.governor and not psutil_missing:
+                        try:
+                            self.governor = ResourceGovernor()
+                        except ImportError:
+                            logging.warning("psutil is not installed, adaptive throttling is disabled")
+                            psutil_missing = True
+                    elif not self.config.adaptive_throttling and self.governor:
+                        self.governor = None
+                        self.wake.set()
+                    
+                    if self.governor and self.governor.sample():
+                        self.wake.set()
+                last_error = None
+            except Exception as e:
+                # A failing sensor must not stop throttling and metrics for good
+                if str(e) != last_error:
+                    logging.error(f"Resource sampling failed, retrying: {e}")
+                last_error = str(e)
+            self._write_metrics()
+            await asyncio.sleep(self.governor.interval if self.governor else 5.0)
+    
+    async def _supervise(self):
+        while self.running:
+            # Walking polled trees takes seconds on big repos, so it stays off the loop
+            try:
+                changed = await asyncio.to_thread(self.watch_supervisor.tick)
+            except Exception as e:
+                logging.error(f"Watch check failed, retrying: {e}")
+                changed = []
+            for path in changed:
+                self._stage_change(path)
+            await asyncio.sleep(WatchSupervisor.TICK)
+    
+    def metrics(self):
+        with self.lock:
+            pending = {str(repo_path): len(journal.paths) for repo_path, journal in self.pending_changes.items()}
+        return {
+            'updated_at': time.time(),
+            'governor': self.governor.metrics() if self.governor else None,
+            'pending_changes': pending,
+            'coalescing': dict(self.coalesce_stats, staged=len(self.staged)),
+            'watches': self.watch_supervisor.metrics() if self.watch_supervisor else None,
+            'last_backup': {repo: when.isoformat(timespec='seconds') for repo, when in self.last_backup.items()},
+        }
+    
+    def _write_metrics(self):
+        if not self.metrics_file:
+            return
+        metrics = self.metrics()
+        governor = metrics['governor'] and {key: value for key, value in metrics['governor'].items()
+                                            if key not in ('cpu_percent', 'disk_mb_per_sec',
+                                                           'battery_percent', 'sampled_at')}
+        state = json.dumps(dict(metrics, updated_at=None, governor=governor), sort_keys=True)
+        last_state, last_time = self.metrics_written
+        if state == last_state and time.monotonic() - last_time < self.METRICS_REFRESH:
+            return
+        
+        temp_file = self.metrics_file.with_name(self.metrics_file.name + '.tmp')
+        try:
+            self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(metrics, f, indent=2)
+            os.replace(temp_file, self.metrics_file)
+            self.metrics_written = (state, time.monotonic())
+        except OSError as e:
+            logging.debug(f"Could not write metrics: {e}")
+    
+    async def _main(self):
+        self.wake = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        tasks = [loop.create_task(self._govern())]
+        if self.watch_supervisor:
+            tasks.append(loop.create_task(self._supervise()))
+        try:
+            await self._scheduler()
+        finally:
+            # Structured shutdown: whatever this handler still runs is cancelled and
+            # awaited, leaving other profiles on a shared loop alone
+            if self.flush_handle:
+                self.flush_handle.cancel()
+            tasks.extend(self.file_locks.values())
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.main_task = self.loop.create_task(self._main())
+            self.loop.run_until_complete(self.main_task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self.loop.close()
+    
+    def request_backup(self):
+        """Run a backup cycle now instead of waiting for the interval"""
+        self.backup_requested = True
+        self._wake_scheduler()
+    
+    def pending_count(self):
+        with self.lock:
+            return sum(len(journal.paths) for journal in self.pending_changes.values())
+    
+    def start_monitoring(self, loop=None):
+        """Run on a loop thread of our own, or on a running loop shared with other profiles"""
+        self.running = True
+        if loop is not None:
+            self.loop = loop
+            self.main_future = asyncio.run_coroutine_threadsafe(self._main(), loop)
+            return
+        self.loop = asyncio.new_event_loop()
+        self.backup_thread = threading.Thread(target=self._run_loop, daemon=True)
+        self.backup_thread.start()
+    
+    def stop_monitoring(self, grace_period=30):
+        self.running = False
+        self._wake_scheduler()
+        if self.main_future:
+            # Let a running backup finish its commit before cancelling it
+            try:
+                self.main_future.result(timeout=grace_period)
+            except futures.TimeoutError:
+                self.main_future.cancel()
+            except futures.CancelledError:
+                pass
+            return
+        if self.backup_thread and self.backup_thread.is_alive():
+            # Let a running backup finish its commit before cancelling it
+            self.backup_thread.join(timeout=grace_period)
+            if self.backup_thread.is_alive() and self.main_task:
+                self.loop.call_soon_threadsafe(self.main_task.cancel)
+                self.backup_thread.join(timeout=10)
+
+class AuditLog:
+    """JSON-lines record of every backup attempt in size-capped segments
+    
+    Each segment is named after the time of its first record and has a
+    sidecar .idx of (time, offset) pairs, so time range queries seek
+    straight to the right place instead of parsing whole files. The last
+    record of every repo is also kept in latest.json for status displays.
+    """
+    SEGMENT_BYTES = 4 * 1024 * 1024
+    SEGMENTS = 8
+    INDEX_SPACING = 16 * 1024
+    INDEX_RECORD = struct.Struct('<dQ')
+    LATEST_FILE = 'latest.json'
+    
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+        self.last_indexed = {}
+        self.latest_cache = None
+    
+    def segments(self):
+        """(start time, path) of each segment, oldest first"""
+        segments = []
+        for path in self.directory.glob('audit-*.jsonl'):
+            try:
+                segments.append((int(path.stem[6:]) / 1000, path))
+            except ValueError:
+                continue
+        return sorted(segments)
+    
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            segments = self.segments()
+            if not segments or segments[-1][1].stat().st_size + len(line) > self.SEGMENT_BYTES:
+                # Rotate, dropping the oldest segments with their indexes
+                for _, old in segments[:max(len(segments) - self.SEGMENTS + 1, 0)]:
+                    for path in (old, old.with_suffix('.idx')):
+                        try:
+                            path.unlink()
+                        except OSError:
+                            pass
+                    self.last_indexed.pop(old, None)
+                segment = self.directory / f"audit-{int(record['time'] * 1000):013d}.jsonl"
+            else:
+                segment = segments[-1][1]
+            
+            with open(segment, 'ab') as f:
+                offset = f.tell()
+                f.write(line)
+            
+            last = self.last_indexed.get(segment)
+            if last is None:
+                index = self._read_index(segment)
+                last = index[-1][1] if index else None
+            if last is None or offset - last >= self.INDEX_SPACING:
+                with open(segment.with_suffix('.idx'), 'ab') as f:
+                    f.write(self.INDEX_RECORD.pack(record['time'], offset))
+                last = offset
+            self.last_indexed[segment] = last
+            
+            # Reread only if another process (a manual backup-all) wrote it since
+            latest_file = self.directory / self.LATEST_FILE
+            try:
+                mtime = latest_file.stat().st_mtime_ns
+            except OSError:
+                mtime = None
+            if self.latest_cache is None or self.latest_cache[0] != mtime:
+                self.latest_cache = (mtime, self._load_latest())
+            latest = self.latest_cache[1]
+            latest[record['repo']] = record
+            temp_file = latest_file.with_name(self.LATEST_FILE + '.tmp')
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(latest, f, ensure_ascii=False)
+            os.replace(temp_file, latest_file)
+            self.latest_cache = (latest_file.stat().st_mtime_ns, latest)
+    
+    def _read_index(self, segment):
+        try:
+            with open(segment.with_suffix('.idx'), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return []
+        usable = len(data) - len(data) % self.INDEX_RECORD.size
+        return list(self.INDEX_RECORD.iter_unpack(data[:usable]))
+    
+    def query(self, since=None, until=None, repo=None):
+        """Records in the time range, optionally for one repo, oldest first"""
+        segments = self.segments()
+        first = 0
+        if since is not None:
+            first = max(bisect.bisect_right([start for start, _ in segments], since) - 1, 0)
+        
+        records = []
+        for start, segment in segments[first:]:
+            if until is not None and start > until:
+                break
+            offset = 0
+            if since is not None:
+                index = self._read_index(segment)
+                position = bisect.bisect_left([when for when, _ in index], since)
+                if position:
+                    offset = index[position - 1][1]
+            try:
+                with open(segment, 'rb') as f:
+                    f.seek(offset)
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            # A line cut short by a crash
+                            continue
+                        if since is not None and record['time'] < since:
+                            continue
+                        if until is not None and record['time'] > until:
+                            continue
+                        if repo is not None and record['repo'] != repo:
+                            continue
+                        records.append(record)
+            except OSError:
+                continue
+        return records
+    
+    def _load_latest(self):
+        try:
+            with open(self.directory / self.LATEST_FILE, 'r', encoding='utf-8') as f:
+                latest = json.load(f)
+            if isinstance(latest, dict):
+                return latest
+        except (OSError, ValueError):
+            pass
+        
+        # Logs written before latest.json existed, or a damaged copy: read them all once
+        latest = {}
+        for _, segment in self.segments():
+            try:
+                with open(segment, 'rb') as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue
+                        latest[record['repo']] = record
+            except OSError:
+                continue
+        return latest
+    
+    def latest(self, repos=None):
+        """Most recent record per repo"""
+        latest = self._load_latest()
+        if repos is None:
+            return latest
+        return {repo: latest[repo] for repo in repos if repo in latest}
+
+class AuditLogHandler(logging.Handler):
+    """Writes audit records to the AuditLog they were logged for"""
+    def emit(self, record):
+        audit_log = getattr(record, 'audit_log', None)
+        if audit_log is None:
+            return
+        try:
+            audit_log.write(record.audit)
+        except Exception:
+            self.handleError(record)
+
+# Audit records go to their files only, never to the console
+logging.getLogger(AUDIT_LOGGER).addHandler(AuditLogHandler())
+logging.getLogger(AUDIT_LOGGER).propagate = False
+
+def start_log_queue(*loggers):
+    """Move the loggers' output to background threads so logging never blocks the event path"""
+    import queue
+    from logging.handlers import QueueHandler, QueueListener
+    listeners = []
+    for logger in loggers:
+        handlers = logger.handlers[:]
+        log_queue = queue.SimpleQueue()
+        for handler in handlers:
+            logger.removeHandler(handler)
+        logger.addHandler(QueueHandler(log_queue))
+        listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        listener.start()
+        listeners.append((logger, handlers, listener))
+    return listeners
+
+def stop_log_queue(listeners):
+    """Flush queued records and put the original handlers back"""
+    for logger, handlers, listener in listeners:
+        listener.stop()
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+        for handler in handlers:
+            logger.addHandler(handler)
+
+class EventTrace:
+    """Compact binary trace of the filesystem events seen by the handler
+
+    The file starts with MAGIC and the watched roots, then holds one record
+    per event: microseconds since the previous event, event type, flags,
+    root index, and the path relative to the root. Moves add the destination's
+    own root index and path, so a move between roots replays between them.
+    Paths outside every root are stored empty under NO_ROOT.
+    """
+    MAGIC = b'GBTRACE2'
+    LEGACY_MAGIC = b'GBTRACE1'
+    EVENT_TYPES = ('created', 'modified', 'deleted', 'moved', 'closed', 'opened', 'overflow')
+    RECORD = struct.Struct('<IBBB')
+    LENGTH = struct.Struct('<H')
+    ROOT = struct.Struct('<B')
+    IS_DIRECTORY = 1
+    HAS_DEST = 2
+    NO_ROOT = 255
+    
+    def __init__(self, trace_file, roots):
+        self.roots = [str(root) for root in roots]
+        self.file = open(trace_file, 'wb')
+        self.lock = threading.Lock()
+        self.last_time = time.monotonic()
+        self.count = 0
+        self.file.write(self.MAGIC + self.LENGTH.pack(len(self.roots)))
+        for root in self.roots:
+            self._write_text(root)
+    
+    def _write_text(self, text):
+        data = text.encode('utf-8')
+        self.file.write(self.LENGTH.pack(len(data)) + data)
+    
+    def _relative(self, path):
+        for index, root in enumerate(self.roots):
+            if path.startswith(root + os.sep):
+                return index, path[len(root) + 1:].replace(os.sep, '/')
+        return self.NO_ROOT, ''
+    
+    def write(self, event):
+        if event.event_type not in self.EVENT_TYPES:
+            return
+        dest_path = getattr(event, 'dest_path', None) or None
+        root, path = self._relative(event.src_path)
+        flags = (self.IS_DIRECTORY if event.is_directory else 0) | (self.HAS_DEST if dest_path else 0)
+        
+        with self.lock:
+            now = time.monotonic()
+            delta = min(int((now - self.last_time) * 1e6), 0xFFFFFFFF)
+            self.last_time = now
+            self.file.write(self.RECORD.pack(delta, self.EVENT_TYPES.index(event.event_type), flags, root))
+            self._write_text(path)
+            if dest_path:
+                dest_root, dest = self._relative(dest_path)
+                self.file.write(self.ROOT.pack(dest_root))
+                self._write_text(dest)
+            self.count += 1
+    
+    def close(self):
+        with self.lock:
+            self.file.close()
+    
+    @classmethod
+    def read(cls, trace_file):
+        """Return (roots, events); events are (offset, type, is_dir, root, path, dest_root, dest)"""
+        with open(trace_file, 'rb') as f:
+            data = f.read()
+        legacy = data.startswith(cls.LEGACY_MAGIC)
+        if not legacy and not data.startswith(cls.MAGIC):
+            raise ValueError(f"{trace_file} is not an event trace")
+        
+        position = len(cls.MAGIC)
+        
+        def text():
+            nonlocal position
+            (length,) = cls.LENGTH.unpack_from(data, position)
+            position += cls.LENGTH.size
+            position += length
+            return data[position - length:position].decode('utf-8')
+        
+        (root_count,) = cls.LENGTH.unpack_from(data, position)
+        position += cls.LENGTH.size
+        roots = [text() for _ in range(root_count)]
+        
+        events = []
+        offset = 0.0
+        while position < len(data):
+            delta, kind, flags, root = cls.RECORD.unpack_from(data, position)
+            position += cls.RECORD.size
+            offset += delta / 1e6
+            path = text()
+            dest_root, dest = root, None
+            if flags & cls.HAS_DEST:
+                # Version 1 traces stored the destination relative to the source's root
+                if not legacy:
+                    (dest_root,) = cls.ROOT.unpack_from(data, position)
+                    position += cls.ROOT.size
+                dest = text()
+            events.append((offset, cls.EVENT_TYPES[kind], bool(flags & cls.IS_DIRECTORY), root, path, dest_root, dest))
+        return roots, events
+
+class ReplayEvent:
+    """Stands in for a watchdog event when feeding a trace to the handler"""
+    def __init__(self, event_type, src_path, dest_path=None, is_directory=False):
+        self.event_type = event_type
+        self.src_path = src_path
+        self.dest_path = dest_path
+        self.is_directory = is_directory
+
+def _apply_trace_event(kind, is_dir, src, dest, sequence):
+    """Reproduce an event's effect on the synthetic tree before it is dispatched"""
+    try:
+        if kind in ('created', 'modified'):
+            if is_dir:
+                src.mkdir(parents=True, exist_ok=True)
+            else:
+                src.parent.mkdir(parents=True, exist_ok=True)
+                src.write_text(f"{sequence}\n", encoding='utf-8')
+        elif kind == 'deleted':
+            if src.is_dir():
+                shutil.rmtree(src, ignore_errors=True)
+            elif src.exists():
+                src.unlink()
+        elif kind == 'moved' and dest is not None:
+            if not src.exists():
+                src.parent.mkdir(parents=True, exist_ok=True)
+                if is_dir:
+                    src.mkdir()
+                else:
+                    src.write_text(f"{sequence}\n", encoding='utf-8')
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(src, dest)
+    except OSError:
+        pass
+
+def _trace_path(roots, root, relative):
+    """Map a recorded path onto its synthetic root, or None if it would leave that root"""
+    if root >= len(roots) or not relative:
+        return None
+    relative = relative.replace('\\', '/')
+    if relative.startswith('/') or re.match(r'[A-Za-z]:', relative) or '..' in relative.split('/'):
+        return None
+    path = roots[root] / relative
+    if not os.path.normpath(path).startswith(str(roots[root]) + os.sep):
+        return None
+    return path
+
+def replay_trace(trace_file, work_dir, speed=1.0, interval=10, drain_timeout=120):
+    """Feed a recorded trace through the handler and scheduler on a synthetic tree"""
+    roots, events = EventTrace.read(trace_file)
+    work_dir = Path(work_dir).resolve()
+    synthetic_roots = [work_dir / f'root{index}' for index in range(len(roots))]
+    for root in synthetic_roots:
+        root.mkdir(parents=True, exist_ok=True)
+    
+    # Synthetic repos need an identity to commit with
+    for key, value in (('GIT_AUTHOR_NAME', 'Git Backup Replay'), ('GIT_AUTHOR_EMAIL', 'replay@localhost'),
+                       ('GIT_COMMITTER_NAME', 'Git Backup Replay'), ('GIT_COMMITTER_EMAIL', 'replay@localhost')):
+        os.environ.setdefault(key, value)
+    
+    config = BackupConfig(backup_interval=interval, auto_push=False, adaptive_throttling=False)
+    handler = WindowsGitBackupHandler(synthetic_roots, config)
+    handler.discover_repos()
+    
+    fed = {}
+    latencies = []
+    backups = [0]
+    
+    def on_backup(repo_path, journal, success):
+        now = time.monotonic()
+        backups[0] += 1
+        for path in (journal.paths if journal else ()):
+            started = fed.pop(path, None)
+            if started is not None:
+                latencies.append(now - started)
+    
+    handler.backup_listener = on_backup
+    handler.start_monitoring()
+    
+    depths = []
+    last_sample = 0.0
+    start = time.monotonic()
+    try:
+        for sequence, (offset, kind, is_dir, root, path, dest_root, dest) in enumerate(events):
+            if speed > 0:
+                delay = start + offset / speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            
+            src = _trace_path(synthetic_roots, root, path)
+            dest_path = None
+            if kind == 'moved':
+                dest_path = _trace_path(synthetic_roots, dest_root, dest)
+                if dest_root == EventTrace.NO_ROOT:
+                    # Moved out of every root: the watcher only saw the file leave
+                    kind = 'deleted'
+                elif root == EventTrace.NO_ROOT and dest_path is not None:
+                    # Moved in from outside: the watcher only saw the file arrive
+                    kind, src, dest_path = 'created', dest_path, None
+                elif dest_path is None:
+                    continue
+            if src is None:
+                continue
+            _apply_trace_event(kind, is_dir, src, dest_path, sequence)
+            now = time.monotonic()
+            for changed in (src, dest_path):
+                if changed is not None and not is_dir and not handler._is_editor_temp(str(changed)):
+                    fed.setdefault(str(changed), now)
+            handler.dispatch(ReplayEvent(kind, str(src), str(dest_path) if dest_path else None, is_dir))
+            
+            if now - last_sample >= 0.05:
+                depths.append(handler.pending_count())
+                last_sample = now
+        
+        feed_time = time.monotonic() - start
+        
+        # Drain: keep backing up until every change has been committed
+        deadline = time.monotonic() + drain_timeout
+        while time.monotonic() < deadline:
+            handler.request_backup()
+            time.sleep(0.2)
+            depths.append(handler.pending_count())
+            if (not handler.pending_count() and not handler.staged and not handler.file_locks
+                    and not handler.backup_running):
+                break
+    finally:
+        handler.stop_monitoring()
+    
+    total_time = time.monotonic() - start
+    latencies.sort()
+    
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+    
+    trace_span = events[-1][0] if events else 0.0
+    print(f"\nReplayed {len(events)} events ({trace_span:.1f}s of trace) in {feed_time:.2f}s"
+          f"{f' at {speed:g}x' if speed > 0 else ' at full speed'}: "
+          f"{len(events) / max(feed_time, 1e-6):.0f} events/s")
+    if depths:
+        print(f"Queue depth:  max {max(depths)} paths, mean {sum(depths) / len(depths):.1f}")
+    stats = handler.coalesce_stats
+    print(f"Coalescing:   {stats['raw_events']} events -> {stats['logical_changes']} changes "
+          f"({stats['dropped_events']} temp or ignored), {stats['lock_probes']} lock probes")
+    print(f"Latency:      p50 {percentile(0.5):.2f}s, p95 {percentile(0.95):.2f}s, "
+          f"max {percentile(1.0):.2f}s over {len(latencies)} changes in {backups[0]} backups")
+    if fed:
+        print(f"Not backed up: {len(fed)} changed paths (ignored or still pending after {total_time:.0f}s)")
+    print()
+    return True
+
+def _count_files(path, limit, is_ignored):
+    """Files a poller of path would track, counting no further than limit + 1"""
+    files = 0
+    stack = [path]
+    while stack and files <= limit:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        # Same pruning as StatCache: changes in there are dropped anyway
+                        if entry.name != '.git' and not is_ignored(entry.path):
+                            stack.append(entry.path)
+                    else:
+                        files += 1
+        except OSError:
+            continue
+    return files
+
+def _count_dirs(path, limit):
+    """Folders under path, each an inotify watch, counting no further than limit + 1"""
+    dirs = 1
+    stack = [path]
+    while stack and dirs <= limit:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs += 1
+                        stack.append(entry.path)
+        except OSError:
+            continue
+    return dirs
+
+def _create_observer():
+    """Watchdog observer whose Windows emitters report buffer overflows as events"""
+    from watchdog.observers import Observer
+    if sys.platform != 'win32':
+        # inotify and FSEvents drop overflow notices inside watchdog, those
+        # platforms rely on emitter liveness checks instead
+        return Observer()
+    from watchdog.observers.api import BaseObserver
+    from watchdog.observers.read_directory_changes import WindowsApiEmitter
+    from watchdog.events import FileSystemEvent
+    
+    class WatchOverflowEvent(FileSystemEvent):
+        event_type = 'overflow'
+        is_directory = True
+    
+    class OverflowReportingEmitter(WindowsApiEmitter):
+        def _read_events(self):
+            events = super()._read_events()
+            # ReadDirectoryChangesW returns zero bytes when its buffer overflowed
+            if not events and self.should_keep_running():
+                self.queue_event(WatchOverflowEvent(self.watch.path))
+            return events
+    
+    return BaseObserver(OverflowReportingEmitter)
+
+class StatCache:
+    """Size and mtime of every file in a tree, so a poll reports only what changed"""
+    def __init__(self, root, is_ignored):
+        self.root = str(root)
+        self.is_ignored = is_ignored
+        self.dirs = {}
+        self.files = 0
+        self.primed = False
+    
+    def scan(self):
+        """Walk the tree and return paths added, changed or removed since the last scan"""
+        seen = {}
+        changed = []
+        stack = [self.root]
+        while stack:
+            directory = stack.pop()
+            entries = {}
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.name != '.git' and not self.is_ignored(entry.path):
+                                    stack.append(entry.path)
+                                continue
+                            # Free on Windows, where scandir already returned the attributes
+                            stat = entry.stat(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        # One int per file rather than a tuple, trees can hold millions
+                        entries[entry.name] = hash((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                continue
+            
+            seen[directory] = entries
+            previous = self.dirs.get(directory, {})
+            changed.extend(os.path.join(directory, name) for name, signature in entries.items()
+                           if previous.get(name) != signature)
+            changed.extend(os.path.join(directory, name) for name in previous.keys() - entries.keys())
+        for directory in self.dirs.keys() - seen.keys():
+            changed.extend(os.path.join(directory, name) for name in self.dirs[directory])
+        
+        self.dirs = seen
+        self.files = sum(len(entries) for entries in seen.values())
+        if not self.primed:
+            # The first scan is the baseline
+            self.primed = True
+            return []
+        return changed
+
+class WatchSupervisor:
+    """Keeps each project root under one native watch, or a stat poller when that fails
+
+    Repos under a watched root with more than native_watch_max_files files get
+    a poller of their own, and the root watch's events for them are dropped.
+    """
+    TICK = 5
+    MIN_POLL_INTERVAL = 5
+    
+    def __init__(self, observer, handler):
+        self.observer = observer
+        self.handler = handler
+        self.native = {}
+        self.native_dirs = {}
+        self.polled = {}
+        self.poll_schedule = {}
+        self.large_repos = set()
+        self.sized_repos = set()
+        self.synced = False
+        self.watch_budget = self._watch_budget()
+        self.stats = {'watch_failures': 0, 'emitter_deaths': 0, 'overflows': 0, 'polls': 0}
+    
+    def _watch_budget(self):
+        # inotify charges one watch per folder against a per-user limit
+        try:
+            with open('/proc/sys/fs/inotify/max_user_watches', 'r') as f:
+                return int(f.read()) * 9 // 10
+        except (OSError, ValueError):
+            return None
     
-    def _set_git_config(self, repo_path):
-        configs = [
-            'git config core.autocrlf true',
-            'git config core.filemode false',
-            'git config core.ignorecase true'
-        ]
-        for config in configs:
-            self._run_git_command(config, repo_path, timeout=10)
+    def _units(self):
+        # One watch (and one emitter thread) per root however many projects it holds;
+        # events lost under a root are recovered by rescanning the repos below it
+        return {str(root) for root in self.handler.project_roots if os.path.isdir(root)}
     
-    def _backup_repo(self, repo_path):
-        if not self._ensure_git_repo(repo_path):
-            return False
+    def _repo_units(self):
+        # Only repos under a native watch need sizing, a polled root already polls them
+        roots = tuple(unit + os.sep for unit in self.native)
+        with self.handler.lock:
+            repos = [str(repo) for repo in self.handler.repos]
+        return {repo for repo in repos if repo.startswith(roots) and os.path.isdir(repo)}
+    
+    def sync(self):
+        """Watch new project roots and large repos, and drop watches on ones that are gone"""
+        units = self._units()
+        for unit in list(self.native):
+            if unit not in units:
+                self._unschedule(unit)
+        repos = self._repo_units()
+        for unit in list(self.polled):
+            if unit not in units and unit not in repos:
+                self._drop_polled(unit)
+        # Roots that appear while running may have changed before their watch existed
+        for unit in sorted(units - self.native.keys() - self.polled.keys()):
+            self._watch(unit, rescan=self.synced)
+        
+        repos = self._repo_units()
+        self.sized_repos &= repos
+        for repo in sorted(repos - self.sized_repos):
+            self.sized_repos.add(repo)
+            self._watch_repo(repo, rescan=self.synced)
+        self._publish_exclusions()
+        self.synced = True
+    
+    def _watch(self, unit, rescan):
+        limit = self.handler.config.native_watch_max_files
+        budget = None if self.watch_budget is None else self.watch_budget - sum(self.native_dirs.values())
+        dirs = _count_dirs(unit, max(budget, 0)) if budget is not None else 0
+        if not limit:
+            reason = "native_watch_max_files is 0"
+        elif budget is not None and dirs > budget:
+            reason = f"{dirs} folders would exceed the inotify watch limit"
+        else:
+            try:
+                self.native[unit] = self.observer.schedule(self.handler, unit, recursive=True)
+                self.native_dirs[unit] = dirs
+                if rescan:
+                    self.handler.request_rescan(unit)
+                return
+            except OSError as e:
+                self.stats['watch_failures'] += 1
+                reason = f"watch refused: {e}"
         
+        logging.info(f"Polling {unit} ({reason})")
+        self._watch_polled(unit, rescan)
+    
+    def _watch_repo(self, repo, rescan):
+        # One big project must not cost the rest of its root the native watch
+        limit = self.handler.config.native_watch_max_files
+        if _count_files(repo, limit, self.handler._is_ignored) > limit:
+            logging.info(f"Polling {repo} (more than {limit} files)")
+            self.large_repos.add(repo)
+            self._watch_polled(repo, rescan)
+    
+    def _drop_polled(self, unit):
+        del self.polled[unit]
+        del self.poll_schedule[unit]
+        self.large_repos.discard(unit)
+    
+    def _publish_exclusions(self):
+        # The handler drops root-watch events under these, their poller reports them
+        self.handler.polled_repos = tuple(sorted(repo + os.sep for repo in self.large_repos))
+    
+    def _unschedule(self, unit):
+        watch = self.native.pop(unit)
+        self.native_dirs.pop(unit, None)
         try:
-            # Check if there are changes
-            status_result = self._run_git_command('git status --porcelain', repo_path)
-            if not status_result or not status_result.stdout.strip():
-                return True
-            
-            # Add all changes
-            add_result = self._run_git_command('git add .', repo_path)
-            if not add_result or add_result.returncode != 0:
-                logging.error(f"Failed to add files in {repo_path}")
-                return False
-            
-            # Create commit
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            commit_msg = f'Auto backup - {timestamp}'
-            commit_cmd = f'git commit -m "{commit_msg}"'
-            
-            commit_result = self._run_git_command(commit_cmd, repo_path)
-            if not commit_result or commit_result.returncode != 0:
-                logging.error(f"Failed to commit in {repo_path}")
-                return False
-            
-            # Try to push if remote exists
-            remote_result = self._run_git_command('git remote', repo_path)
-            if remote_result and remote_result.stdout.strip():
-                push_result = self._run_git_command('git push', repo_path, timeout=30)
-                if push_result and push_result.returncode != 0:
-                    logging.warning(f"Push failed for {repo_path}: {push_result.stderr}")
-            
-            logging.info(f"Backup completed for {repo_path.name}")
-            return True
-            
-        except Exception as e:
-            logging.error(f"Backup failed for {repo_path}: {e}")
-            return False
+            self.observer.unschedule(watch)
+        except (KeyError, OSError):
+            pass
     
-    def _backup_worker(self):
-        while self.running:
-            repos_to_backup = {}
-            
-            with self.lock:
-                if self.pending_changes:
-                    repos_to_backup = self.pending_changes.copy()
-                    self.pending_changes.clear()
-            
-            for repo_path in repos_to_backup:
-                if repo_path.exists():
-                    success = self._backup_repo(repo_path)
-                    if success:
-                        self.last_backup[str(repo_path)] = datetime.now()
+    def check(self):
+        """Move roots whose watch died to polling"""
+        # Emitters die when the OS refuses a watch for a new subfolder or a drive goes away
+        alive = {emitter.watch: emitter.is_alive() for emitter in list(self.observer.emitters)}
+        for unit, watch in list(self.native.items()):
+            if not alive.get(watch, False):
+                self.stats['emitter_deaths'] += 1
+                logging.warning(f"Lost the file watch on {unit}, polling it instead")
+                self._unschedule(unit)
+                # The root's poller covers its large repos too
+                for repo in [repo for repo in self.large_repos if repo.startswith(unit + os.sep)]:
+                    self._drop_polled(repo)
+                self.sized_repos = {repo for repo in self.sized_repos if not repo.startswith(unit + os.sep)}
+                self._publish_exclusions()
+                self._watch_polled(unit, rescan=True)
+    
+    def _watch_polled(self, unit, rescan):
+        self.polled[unit] = StatCache(unit, self.handler._is_ignored)
+        self.poll_schedule[unit] = (0, self.MIN_POLL_INTERVAL)
+        if rescan:
+            self.handler.request_rescan(unit)
+    
+    def poll(self):
+        """Scan the polled roots that are due and return the paths that changed"""
+        changed = []
+        governor = self.handler.governor
+        max_interval = self.handler.config.backup_interval * (governor.interval_factor() if governor else 1)
+        for unit, cache in list(self.polled.items()):
+            due, interval = self.poll_schedule[unit]
+            if time.monotonic() < due:
+                continue
+            start = time.monotonic()
+            paths = cache.scan()
+            elapsed = time.monotonic() - start
+            self.stats['polls'] += 1
             
-            time.sleep(self.backup_interval)
+            # Busy trees are polled often, quiet ones back off, and scanning never
+            # takes more than a twentieth of the time
+            interval = self.MIN_POLL_INTERVAL if paths else min(interval * 2, max_interval)
+            interval = max(interval, elapsed * 20)
+            self.poll_schedule[unit] = (time.monotonic() + interval, interval)
+            changed.extend(paths)
+        return changed
     
-    def start_monitoring(self):
-        self.running = True
-        self.backup_thread = threading.Thread(target=self._backup_worker, daemon=True)
-        self.backup_thread.start()
+    def tick(self):
+        self.sync()
+        self.check()
+        return self.poll()
     
-    def stop_monitoring(self):
-        self.running = False
-        if self.backup_thread and self.backup_thread.is_alive():
-            self.backup_thread.join(timeout=10)
+    def metrics(self):
+        return dict(self.stats,
+                    native=len(self.native),
+                    polled=len(self.polled) - len(self.large_repos),
+                    polled_repos=len(self.large_repos),
+                    polled_files=sum(cache.files for cache in self.polled.values()),
+                    poll_intervals={unit: round(interval, 1) for unit, (_, interval) in self.poll_schedule.items()})
+
+class ConfigFileWatcher:
+    """Calls back once the config file has been rewritten"""
+    def __init__(self, config_file, callback, delay=1.0):
+        self.config_file = os.path.normcase(os.path.abspath(config_file))
+        self.callback = callback
+        self.delay = delay
+        self.timer = None
+        self.lock = threading.Lock()
+    
+    def dispatch(self, event):
+        paths = (event.src_path, getattr(event, 'dest_path', None))
+        if not any(path and os.path.normcase(os.path.abspath(path)) == self.config_file
+                   for path in paths):
+            return
+        
+        # Writers emit several events per save, so reload once they settle
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.delay, self.callback)
+            self.timer.daemon = True
+            self.timer.start()
+    
+    def cancel(self):
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
 
 class WindowsGitBackupManager:
-    def __init__(self):
-        self.user_profile = Path(os.environ.get('USERPROFILE', Path.home()))
+    def __init__(self, user_profile=None):
+        self.user_profile = Path(user_profile or os.environ.get('USERPROFILE', Path.home()))
         self.desktop = self.user_profile / 'Desktop'
         self.projects_path = self.desktop / 'projects'
+        self.project_roots = [self.projects_path]
         self.config_file = self.desktop / '.git_backup_config.json'
+        self.metrics_file = data_directory(self.user_profile) / 'metrics.json'
+        self.audit_log = AuditLog(audit_directory(self.user_profile))
+        self.log_queue = None
         self.observer = None
         self.handler = None
+        self.config_watcher = None
+        self.watch_supervisor = None
         self.running = False
         
+        self.git_env = None
+        self.git_overrides = ()
+        if user_profile:
+            # Git reads this profile's settings; the service only serves profiles
+            # owned by the account it runs as (install-service sets up one task per user)
+            self.git_env = dict(os.environ, HOME=str(self.user_profile), USERPROFILE=str(self.user_profile))
+            self.git_overrides = SERVICE_GIT_OVERRIDES
+        
         # Setup signal handlers for graceful shutdown
         signal.signal(signal.SIGINT, self._signal_handler)
         signal.signal(signal.SIGTERM, self._signal_handler)
@@ -299,35 +2407,115 @@ class WindowsGitBackupManager:
         self.stop()
         sys.exit(0)
     
+    def _read_config(self):
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            return BackupConfig.from_dict(json.load(f))
+    
     def _load_config(self):
-        default_config = {
-            'backup_interval': 300,
-            'auto_push': True,
-            'max_file_size_mb': 100,
-            'excluded_extensions': ['.exe', '.dll', '.bin', '.iso']
-        }
-        
         if self.config_file.exists():
             try:
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    # Merge with defaults
-                    for key, value in default_config.items():
-                        if key not in config:
-                            config[key] = value
-                    return config
-            except (json.JSONDecodeError, IOError, UnicodeDecodeError) as e:
+                return self._read_config()
+            except (json.JSONDecodeError, IOError, UnicodeDecodeError, ValueError) as e:
                 logging.warning(f"Config file error: {e}, using defaults")
+                return BackupConfig()
+        
+        config = BackupConfig()
+        # Empty values mean "use the built-in default", so they are left out
+        self._save_config({key: value for key, value in config.to_dict().items()
+                           if value not in ('', [])})
+        return config
+    
+    def _project_roots(self, config):
+        roots = config.project_roots or [config.projects_path or self.projects_path]
+        project_roots = []
+        for root in roots:
+            path = Path(os.path.expandvars(str(root))).expanduser()
+            if path not in project_roots:
+                project_roots.append(path)
+        return project_roots
+    
+    def _reload_config(self):
+        try:
+            config = self._read_config()
+        except (json.JSONDecodeError, IOError, UnicodeDecodeError, ValueError) as e:
+            logging.warning(f"Ignoring config change: {e}")
+            return
         
-        self._save_config(default_config)
-        return default_config
+        if not self.handler or config == self.handler.config:
+            return
+        self.handler.apply_config(config)
+        logging.info(f"Configuration reloaded (interval {config.backup_interval}s, "
+                     f"{config.max_parallel_repos} parallel repos, auto push {config.auto_push})")
+        
+        roots = self._project_roots(config)
+        if roots == self.project_roots:
+            return
+        
+        self.project_roots = roots
+        self._create_project_roots()
+        # Watches follow on the supervisor's next tick
+        repos = self.handler.set_project_roots(roots)
+        logging.info(f"Project roots reloaded: {', '.join(map(str, roots))} "
+                     f"({len(repos)} repositories)")
+    
+    def _create_project_roots(self):
+        for root in self.project_roots:
+            if not root.exists():
+                try:
+                    root.mkdir(parents=True, exist_ok=True)
+                    logging.info(f"Created projects directory: {root}")
+                except OSError as e:
+                    logging.warning(f"Cannot create projects directory {root}: {e}")
+    
+    def _discover_repos(self):
+        config = self._load_config()
+        self.project_roots = self._project_roots(config)
+        handler = self._create_handler(config)
+        return handler, handler.discover_repos()
     
-    def _save_config(self, config):
+    def _create_handler(self, config):
+        handler = WindowsGitBackupHandler(self.project_roots, config)
+        handler.metrics_file = self.metrics_file
+        handler.audit_log = self.audit_log
+        handler.git_env = self.git_env
+        handler.git_overrides = self.git_overrides
+        return handler
+    
+    def _repo_label(self, repo_path):
+        for root in self.project_roots:
+            try:
+                return repo_path.relative_to(root.resolve()).as_posix()
+            except ValueError:
+                continue
+        return repo_path.name
+    
+    def _find_project(self, project_name, repos):
+        matches = [repo for repo in repos if self._repo_label(repo) == project_name]
+        if not matches:
+            matches = [repo for repo in repos if repo.name == project_name]
+        if len(matches) > 1:
+            logging.error(f"Project name '{project_name}' is ambiguous, use its path relative to the root")
+            return None
+        return matches[0] if matches else None
+    
+    def _save_config(self, changes):
+        """Write only the changed keys, refusing to touch a file that fails validation"""
+        # Keep keys written by other tools (the GUI saves its own subset)
+        data = {}
+        if self.config_file.exists():
+            with open(self.config_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("config must be a JSON object")
+        data.update(changes)
+        config = BackupConfig.from_dict(data)
+        
         try:
             with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(config, f, indent=2, ensure_ascii=False)
+                json.dump(data, f, indent=2, ensure_ascii=False)
         except IOError as e:
             logging.error(f"Failed to save config: {e}")
+        return config
     
     def _check_prerequisites(self):
         # Check if running as admin (optional but recommended)
@@ -341,23 +2529,16 @@ class WindowsGitBackupManager:
         
         # Check Git installation
         try:
-            git_bash_path = WindowsGitBackupHandler._find_git_bash(None)
-            result = subprocess.run([git_bash_path, '-c', 'git --version'], 
-                                  check=True, capture_output=True, text=True,
-                                  creationflags=subprocess.CREATE_NO_WINDOW)
-            logging.info(f"Git version: {result.stdout.strip()}")
+            logging.info(f"Git version: {find_git()['version']}")
         except (subprocess.CalledProcessError, FileNotFoundError) as e:
             logging.error("Git Bash not found. Please install Git for Windows from https://git-scm.com/")
             return False
         
-        # Create projects directory
-        if not self.projects_path.exists():
-            try:
-                self.projects_path.mkdir(parents=True, exist_ok=True)
-                logging.info(f"Created projects directory: {self.projects_path}")
-            except OSError as e:
-                logging.error(f"Cannot create projects directory: {e}")
-                return False
+        # Create projects directories
+        self._create_project_roots()
+        if not any(root.exists() for root in self.project_roots):
+            logging.error("No projects directory is available")
+            return False
         
         # Check disk space
         try:
@@ -370,52 +2551,92 @@ class WindowsGitBackupManager:
         return True
     
     def start(self, backup_interval=None):
+        config = self._load_config()
+        self.project_roots = self._project_roots(config)
         if not self._check_prerequisites():
             return False
         
-        config = self._load_config()
         if backup_interval:
-            config['backup_interval'] = backup_interval
-            self._save_config(config)
+            try:
+                config = self._save_config({'backup_interval': backup_interval})
+            except (json.JSONDecodeError, IOError, UnicodeDecodeError, ValueError) as e:
+                logging.error(f"Cannot set the interval, fix {self.config_file} first: {e}")
+                return False
         
+        # From here on log records are written by background threads
+        self.log_queue = start_log_queue(logging.getLogger(), logging.getLogger(AUDIT_LOGGER))
         try:
-            self.handler = WindowsGitBackupHandler(self.projects_path, config['backup_interval'])
-            self.observer = Observer()
-            self.observer.schedule(self.handler, str(self.projects_path), recursive=True)
+            self.handler = self._create_handler(config)
+            repos = self.handler.discover_repos()
             
+            # Started first, so a refused watch fails its own schedule call and not start()
+            self.observer = _create_observer()
             self.observer.start()
+            
+            # Watch the config file so changes apply without a restart
+            self.config_watcher = ConfigFileWatcher(self.config_file, self._reload_config)
+            self.observer.schedule(self.config_watcher, str(self.config_file.parent), recursive=False)
+            
+            self.watch_supervisor = WatchSupervisor(self.observer, self.handler)
+            self.watch_supervisor.sync()
+            self.handler.watch_supervisor = self.watch_supervisor
             self.handler.start_monitoring()
             self.running = True
             
-            logging.info(f"Git backup monitoring started for: {self.projects_path}")
-            logging.info(f"Backup interval: {config['backup_interval']} seconds")
+            logging.info(f"Git backup monitoring started for: {', '.join(map(str, self.project_roots))}")
+            logging.info(f"Found {len(repos)} repositories")
+            logging.info(f"Backup interval: {config.backup_interval} seconds")
             logging.info("Press Ctrl+C to stop")
             return True
             
         except Exception as e:
             logging.error(f"Failed to start monitoring: {e}")
+            stop_log_queue(self.log_queue)
+            self.log_queue = None
+            return False
+    
+    def record(self, trace_file, duration=None, backup_interval=None):
+        """Run monitoring while writing every event the handler sees to a trace"""
+        if not self.start(backup_interval):
             return False
+        
+        recorder = EventTrace(trace_file, self.handler.project_roots)
+        self.handler.recorder = recorder
+        logging.info(f"Recording events to {trace_file}")
+        try:
+            deadline = time.monotonic() + duration if duration else None
+            while self.running and (deadline is None or time.monotonic() < deadline):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.handler.recorder = None
+            recorder.close()
+            self.stop()
+        logging.info(f"Recorded {recorder.count} events")
+        return True
     
     def stop(self):
         if self.running:
             self.running = False
+            if self.config_watcher:
+                self.config_watcher.cancel()
             if self.observer and self.observer.is_alive():
                 self.observer.stop()
                 self.observer.join(timeout=10)
             if self.handler:
                 self.handler.stop_monitoring()
             logging.info("Git backup monitoring stopped")
+        if self.log_queue:
+            stop_log_queue(self.log_queue)
+            self.log_queue = None
     
     def status(self):
-        if not self.projects_path.exists():
+        handler, repos = self._discover_repos()
+        if not any(root.exists() for root in self.project_roots):
             print("Projects directory does not exist")
             return
         
-        repos = []
-        for item in self.projects_path.iterdir():
-            if item.is_dir() and not item.name.startswith('.'):
-                repos.append(item)
-        
         if not repos:
             print("No project directories found")
             return
@@ -423,33 +2644,38 @@ class WindowsGitBackupManager:
         print(f"\nFound {len(repos)} project directories:")
         print("-" * 60)
         
+        attempts = self.audit_log.latest([str(repo) for repo in repos])
         for repo in repos:
             git_dir = repo / '.git'
+            name = self._repo_label(repo)
             if git_dir.exists():
                 try:
                     # Get last commit info using Git Bash
-                    handler = WindowsGitBackupHandler(self.projects_path)
                     result = handler._run_git_command('git log -1 --format="%h %s %cr"', repo)
                     if result and result.returncode == 0:
                         commit_info = result.stdout.strip().strip('"')
-                        print(f"  {repo.name:<20} Git repo - {commit_info}")
+                        print(f"  {name:<20} Git repo - {commit_info}")
                     else:
-                        print(f"  {repo.name:<20} Git repo (no commits)")
+                        print(f"  {name:<20} Git repo (no commits)")
                 except:
-                    print(f"  {repo.name:<20} Git repo")
+                    print(f"  {name:<20} Git repo")
             else:
-                print(f"  {repo.name:<20} Not initialized")
+                print(f"  {name:<20} Not initialized")
+            attempt = attempts.get(str(repo))
+            if attempt:
+                when = datetime.fromtimestamp(attempt['time']).strftime('%Y-%m-%d %H:%M:%S')
+                error = f": {attempt['error']}" if attempt.get('error') else ''
+                print(f"  {'':<20} last attempt {when} {attempt['result']}{error}")
         print()
     
     def setup_remote(self, project_name, remote_url):
-        repo_path = self.projects_path / project_name
-        if not repo_path.exists():
+        handler, repos = self._discover_repos()
+        repo_path = self._find_project(project_name, repos)
+        if not repo_path:
             logging.error(f"Project directory '{project_name}' does not exist")
             return False
         
-        handler = WindowsGitBackupHandler(self.projects_path)
-        
-        if not handler._ensure_git_repo(repo_path):
+        if not asyncio.run(handler._ensure_git_repo(repo_path)):
             logging.error(f"Failed to initialize Git repo in {project_name}")
             return False
         
@@ -468,25 +2694,495 @@ class WindowsGitBackupManager:
         logging.error(f"Failed to set remote for {project_name}")
         return False
     
+    def find_snapshots(self, project_name, file_pattern=None, since=None, until=None, quiet=False):
+        """Look up backups by file and change time in the snapshot index"""
+        handler, repos = self._discover_repos()
+        repo_path = self._find_project(project_name, repos)
+        if not repo_path:
+            logging.error(f"Project directory '{project_name}' does not exist")
+            return None
+        
+        snapshots = handler.read_snapshots(repo_path)
+        if not snapshots:
+            if not quiet:
+                print(f"No snapshot index for {project_name} yet, it is written by each new backup")
+            return []
+        
+        matches = []
+        for snapshot in snapshots:
+            start = snapshot.get('first') or snapshot['time']
+            end = max(snapshot.get('last') or start, snapshot['time'])
+            if since is not None and end < since:
+                continue
+            if until is not None and start > until:
+                continue
+            if file_pattern:
+                files = [path for path in handler.snapshot_files(repo_path, snapshot)
+                         if path_matches(path, file_pattern)]
+                if not files:
+                    continue
+            else:
+                files = snapshot['files']
+            matches.append(dict(snapshot, files=files))
+        
+        if quiet:
+            return matches
+        
+        print(f"\n{len(matches)} of {len(snapshots)} snapshots in {project_name} match:")
+        print("-" * 60)
+        for snapshot in matches:
+            committed = datetime.fromtimestamp(snapshot['time']).strftime('%Y-%m-%d %H:%M:%S')
+            window = ''
+            if snapshot.get('first'):
+                window = (f"  changes {datetime.fromtimestamp(snapshot['first']).strftime('%H:%M:%S')}"
+                          f"-{datetime.fromtimestamp(snapshot['last']).strftime('%H:%M:%S')}")
+            count = len(snapshot['files']) if file_pattern else snapshot.get('file_count', len(snapshot['files'] or ()))
+            print(f"  {snapshot['commit'][:10]}  {committed}{window}  {count} files")
+            if file_pattern:
+                for path in snapshot['files']:
+                    print(f"      {path}")
+        print()
+        return matches
+    
+    def restore(self, project_name, path, at=None, destination=None):
+        """Restore a file or directory as it was at the given time"""
+        handler, repos = self._discover_repos()
+        repo_path = self._find_project(project_name, repos)
+        if not repo_path or not (repo_path / '.git').exists():
+            logging.error(f"Project '{project_name}' is not a backed up repository")
+            return False
+        
+        at = time.time() if at is None else at
+        commit, commit_time = handler.resolve_snapshot(repo_path, at)
+        if not commit:
+            logging.error(f"No backup of {project_name} exists before {datetime.fromtimestamp(at)}")
+            return False
+        
+        # The project root itself is '.', an empty path would match nothing
+        path = path.replace('\\', '/').strip('/') or '.'
+        destination = Path(destination) if destination else repo_path
+        start = time.time()
+        restored = handler.restore(repo_path, commit, path, destination)
+        if not restored:
+            logging.error(f"'{path}' is not in the backup {commit[:10]}")
+            return False
+        
+        logging.info(f"Restored {restored} files of '{path or '.'}' from {commit[:10]} "
+                     f"({datetime.fromtimestamp(commit_time)}) to {destination} "
+                     f"in {time.time() - start:.2f}s")
+        return True
+    
+    def show_metrics(self):
+        try:
+            with open(self.metrics_file, 'r', encoding='utf-8') as f:
+                metrics = json.load(f)
+        except (IOError, json.JSONDecodeError):
+            print("No metrics yet, they are written while monitoring is running")
+            return False
+        
+        age = time.time() - metrics.get('updated_at', 0)
+        print(f"\nMetrics from {age:.0f}s ago:")
+        print("-" * 60)
+        governor = metrics.get('governor')
+        if governor:
+            battery = (f", battery {governor['battery_percent']}%{' (unplugged)' if governor['on_battery'] else ''}"
+                       if governor['battery_percent'] is not None else '')
+            print(f"  Load level:      {governor['level']} (cpu {governor['cpu_percent']:.0f}%, "
+                  f"disk {governor['disk_mb_per_sec']} MB/s{battery})")
+            print(f"  Interval factor: x{governor['interval_factor']}, "
+                  f"{governor['level_changes']} level changes")
+        else:
+            print("  Load level:      throttling disabled")
+        print(f"  Pending repos:   {len(metrics.get('pending_changes', {}))}")
+        coalescing = metrics.get('coalescing')
+        if coalescing:
+            print(f"  Coalescing:      {coalescing['raw_events']} events -> "
+                  f"{coalescing['logical_changes']} changes, {coalescing['lock_probes']} lock probes")
+        day = self.audit_log.query(since=time.time() - 86400)
+        if day:
+            failed = sum(1 for record in day if record['result'] == 'failed')
+            durations = sorted(record['duration'] for record in day)
+            print(f"  Last 24 hours:   {len(day)} backup attempts, {failed} failed, "
+                  f"median {durations[len(durations) // 2]:.2f}s, "
+                  f"{sum(record['bytes'] for record in day) / 1024 / 1024:.1f} MB committed")
+        watches = metrics.get('watches')
+        if watches:
+            print(f"  Watches:         {watches['native']} native, {watches['polled']} polled roots, "
+                  f"{watches.get('polled_repos', 0)} polled repos ({watches['polled_files']} files), "
+                  f"{watches['overflows']} overflows, "
+                  f"{watches['watch_failures'] + watches['emitter_deaths']} lost watches")
+        print()
+        return True
+    
+    def show_audit(self, project_name=None, since=None, until=None, failed_only=False):
+        """Print backup attempts from the audit log"""
+        repo = None
+        if project_name:
+            handler, repos = self._discover_repos()
+            repo_path = self._find_project(project_name, repos)
+            if not repo_path:
+                logging.error(f"Project directory '{project_name}' does not exist")
+                return False
+            repo = str(repo_path)
+        
+        records = self.audit_log.query(since, until, repo)
+        if failed_only:
+            records = [record for record in records if record['result'] == 'failed']
+        print(f"\n{len(records)} backup attempts:")
+        print("-" * 60)
+        for record in records:
+            when = datetime.fromtimestamp(record['time']).strftime('%Y-%m-%d %H:%M:%S')
+            steps = ' '.join(f"{name} {seconds:.2f}s" for name, seconds in record['steps'].items())
+            error = f"  {record['error']}" if record.get('error') else ''
+            print(f"  {when}  {Path(record['repo']).name:<20} {record['result']:<10} {record['duration']:6.2f}s  "
+                  f"{record['files']} files, {record['bytes']} bytes  [{steps}]{error}")
+        print()
+        return True
+    
     def force_backup_all(self):
         """Force immediate backup of all projects"""
-        if not self.projects_path.exists():
-            return
-        
-        handler = WindowsGitBackupHandler(self.projects_path)
-        repos = [d for d in self.projects_path.iterdir() if d.is_dir() and not d.name.startswith('.')]
+        handler, repos = self._discover_repos()
         
         logging.info(f"Force backing up {len(repos)} repositories...")
         
-        for repo in repos:
-            success = handler._backup_repo(repo)
+        results = asyncio.run(handler.backup_repos({repo: None for repo in repos}))
+        for repo, success in results.items():
             if success:
-                logging.info(f"✓ Backed up {repo.name}")
+                logging.info(f"✓ Backed up {self._repo_label(repo)}")
             else:
-                logging.warning(f"✗ Failed to backup {repo.name}")
+                logging.warning(f"✗ Failed to backup {self._repo_label(repo)}")
+    
+    def replicate(self, project_name=None, target=None):
+        """Write pending bundles for one or all projects to the configured targets"""
+        handler, repos = self._discover_repos()
+        targets = (target,) if target else handler.config.replication_targets
+        if not targets:
+            logging.error("No replication_targets configured, pass --to DIR or add them to the config")
+            return False
+        if project_name:
+            repo_path = self._find_project(project_name, repos)
+            if not repo_path:
+                logging.error(f"Project directory '{project_name}' does not exist")
+                return False
+            repos = [repo_path]
+        repos = [repo for repo in repos if (repo / '.git').exists()]
+        
+        async def replicate_all():
+            semaphore = asyncio.Semaphore(handler.config.max_parallel_repos)
+            
+            async def replicate(repo_path):
+                async with semaphore:
+                    return await handler.replicate(repo_path, targets=targets)
+            return await asyncio.gather(*(replicate(repo) for repo in repos))
+        
+        ok = True
+        for repo, results in zip(repos, asyncio.run(replicate_all())):
+            for destination, outcome in results.items():
+                print(f"  {self._repo_label(repo):<20} {destination}: {outcome}")
+                ok = ok and outcome not in ('failed', 'unavailable')
+        return ok
+
+class BackupService:
+    """One process backing up several profiles that belong to the account running it
+    
+    Every profile keeps its own roots, config, metrics, audit log and git
+    identity, while the event loop, observer, log threads, resource
+    governor and git process slots are shared, so adding a profile adds
+    state rather than threads. Profiles of other accounts are refused: git
+    would have to trust repos whose config can name programs for it to run.
+    """
+    CONFIG_POLL_INTERVAL = 5
+    
+    def __init__(self, homes):
+        self.managers = [WindowsGitBackupManager(home) for home in homes]
+        self.observer = None
+        self.loop = None
+        self.loop_thread = None
+        self.slots = None
+        self.governor_future = None
+        self.stopping = None
+        self.config_mtimes = {}
+        self.log_queue = None
+        self.running = False
+        
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+    
+    def _signal_handler(self, signum, frame):
+        logging.info("Shutdown signal received")
+        self.stop()
+        sys.exit(0)
+    
+    def _config_mtime(self, manager):
+        try:
+            return manager.config_file.stat().st_mtime_ns
+        except OSError:
+            return None
+    
+    def _start_profile(self, manager):
+        config = manager._load_config()
+        manager.project_roots = manager._project_roots(config)
+        if not manager._check_prerequisites():
+            return False
+        foreign = [root for root in manager.project_roots if not owned_by_current_account(root)]
+        if foreign:
+            # Making git trust them would let that user's repo config run programs as this account
+            logging.error(f"Profile {manager.user_profile}: {', '.join(map(str, foreign))} belongs to "
+                          f"another account; back it up as that user (install-service)")
+            return False
+        
+        handler = manager._create_handler(config)
+        handler.git_slots = self.slots.for_profile(str(manager.user_profile),
+                                                   lambda: handler.config.max_git_processes)
+        handler.shared_governor = True
+        repos = handler.discover_repos()
+        manager.handler = handler
+        manager.watch_supervisor = WatchSupervisor(self.observer, handler)
+        manager.watch_supervisor.sync()
+        handler.watch_supervisor = manager.watch_supervisor
+        self.config_mtimes[manager.config_file] = self._config_mtime(manager)
+        handler.start_monitoring(self.loop)
+        manager.running = True
+        logging.info(f"Profile {manager.user_profile}: {len(repos)} repositories in "
+                     f"{', '.join(map(str, manager.project_roots))}")
+        return True
+    
+    def start(self):
+        try:
+            find_git()
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            logging.error("Git Bash not found. Please install Git for Windows from https://git-scm.com/")
+            return False
+        
+        self.log_queue = start_log_queue(logging.getLogger(), logging.getLogger(AUDIT_LOGGER))
+        self.loop = asyncio.new_event_loop()
+        self.stopping = asyncio.Event()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.loop_thread.start()
+        self.slots = FairSlots((os.cpu_count() or 1) * 2)
+        self.observer = _create_observer()
+        self.observer.start()
+        self.running = True
+        
+        started = 0
+        for manager in self.managers:
+            try:
+                if self._start_profile(manager):
+                    started += 1
+            except Exception as e:
+                logging.error(f"Failed to start profile {manager.user_profile}: {e}")
+        if not started:
+            logging.error("No profile could be started")
+            self.stop()
+            return False
+        
+        self.governor_future = asyncio.run_coroutine_threadsafe(self._govern(), self.loop)
+        logging.info(f"Git backup service started for {started} of {len(self.managers)} profiles")
+        return True
+    
+    async def _govern(self):
+        try:
+            governor = ResourceGovernor()
+        except ImportError:
+            logging.warning("psutil is not installed, adaptive throttling is disabled")
+            governor = None
+        
+        last_error = None
+        while not self.stopping.is_set():
+            try:
+                changed = governor.sample() if governor else False
+                handlers = [manager.handler for manager in self.managers if manager.running]
+                for handler in handlers:
+                    handler.governor = governor if handler.config.adaptive_throttling else None
+                    if changed:
+                        handler._wake_scheduler()
+                
+                # Polling config files costs one stat per profile instead of a watcher thread each
+                await asyncio.to_thread(self._reload_changed_configs)
+                last_error = None
+            except Exception as e:
+                if str(e) != last_error:
+                    logging.error(f"Service governor failed, retrying: {e}")
+                last_error = str(e)
+            try:
+                await asyncio.wait_for(self.stopping.wait(),
+                                       governor.interval if governor else self.CONFIG_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _reload_changed_configs(self):
+        for manager in self.managers:
+            if not manager.running:
+                continue
+            mtime = self._config_mtime(manager)
+            if mtime != self.config_mtimes.get(manager.config_file):
+                self.config_mtimes[manager.config_file] = mtime
+                manager._reload_config()
+    
+    def stop(self, grace_period=30):
+        if not self.running:
+            return
+        self.running = False
+        
+        # Signal every profile first so their final backups finish side by side
+        running = [manager for manager in self.managers if manager.running]
+        for manager in running:
+            manager.handler.running = False
+            manager.handler._wake_scheduler()
+        deadline = time.monotonic() + grace_period
+        for manager in running:
+            manager.handler.stop_monitoring(max(deadline - time.monotonic(), 0.1))
+            manager.running = False
+        
+        if self.governor_future:
+            self.loop.call_soon_threadsafe(self.stopping.set)
+            try:
+                self.governor_future.result(timeout=10)
+            except futures.TimeoutError:
+                self.governor_future.cancel()
+        if self.observer and self.observer.is_alive():
+            self.observer.stop()
+            self.observer.join(timeout=10)
+        if self.loop_thread and self.loop_thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join(timeout=10)
+            if not self.loop_thread.is_alive():
+                self.loop.close()
+        logging.info("Git backup service stopped")
+        if self.log_queue:
+            stop_log_queue(self.log_queue)
+            self.log_queue = None
+    
+    def run(self):
+        if not self.start():
+            return False
+        try:
+            while self.running:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+        return True
+
+def bench_startup(runs=10, budget_ms=100):
+    """Time interpreter start plus module import, the fixed cost of every command"""
+    probe = ("import sys, time; start = time.perf_counter(); import git_backup; "
+             "print((time.perf_counter() - start) * 1000); "
+             "print(','.join(m for m in git_backup.HEAVY_MODULES if m in sys.modules))")
+    wall_times, import_times, loaded = [], [], set()
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-c', probe], cwd=Path(__file__).resolve().parent,
+                                capture_output=True, text=True)
+        wall_times.append((time.perf_counter() - start) * 1000)
+        if result.returncode != 0:
+            print(f"Import failed: {result.stderr.strip()}")
+            return False
+        import_ms, modules = (result.stdout.splitlines() + [''])[:2]
+        import_times.append(float(import_ms))
+        loaded.update(filter(None, modules.split(',')))
+    
+    wall_times.sort()
+    import_times.sort()
+    wall, imports = wall_times[runs // 2], import_times[runs // 2]
+    print(f"Startup over {runs} runs: median {wall:.1f} ms (import {imports:.1f} ms), budget {budget_ms} ms")
+    if loaded:
+        print(f"Heavy modules loaded at import time: {', '.join(sorted(loaded))}")
+    return wall <= budget_ms and not loaded
+
+def _build_tree(path, files, per_dir=1000):
+    """Create empty files spread over folders of per_dir, skipping ones already there"""
+    for d in range((files + per_dir - 1) // per_dir):
+        folder = path / f'd{d:05}'
+        folder.mkdir(parents=True, exist_ok=True)
+        for f in range(min(per_dir, files - d * per_dir)):
+            (folder / f'f{f:04}.txt').touch()
+
+def bench_watches(work_dir, files=1000000, projects=50, max_watches=None):
+    """Watch a big and a wide project root and check that changes are seen either way"""
+    work_dir = Path(work_dir)
+    big_root, wide_root = work_dir / 'big', work_dir / 'wide'
+    start = time.monotonic()
+    _build_tree(big_root / 'huge', files)
+    for i in range(projects):
+        _build_tree(wide_root / f'project{i:03}', 40, per_dir=4)
+    print(f"Tree: {files} files in one project and {projects} small projects, "
+          f"ready in {time.monotonic() - start:.1f}s")
+    
+    limit_file = Path('/proc/sys/fs/inotify/max_user_watches')
+    original_limit = None
+    if max_watches:
+        # Needs root; restored below so the machine is left as it was
+        original_limit = limit_file.read_text().strip()
+        limit_file.write_text(str(max_watches))
+        print(f"inotify max_user_watches lowered from {original_limit} to {max_watches}")
+    
+    observer = _create_observer()
+    handler = WindowsGitBackupHandler([big_root, wide_root], BackupConfig())
+    handler.discover_repos()
+    supervisor = WatchSupervisor(observer, handler)
+    handler.watch_supervisor = supervisor
+    touched = [big_root / 'huge' / 'd00000' / 'f0000.txt', wide_root / 'project000' / 'd00000' / 'f0000.txt']
+    threads = threading.active_count()
+    try:
+        observer.start()
+        start = time.monotonic()
+        supervisor.sync()
+        print(f"Watches set up in {time.monotonic() - start:.1f}s: "
+              f"native {sorted(Path(unit).name for unit in supervisor.native)}, "
+              f"polled {sorted(Path(unit).name for unit in supervisor.polled)}, "
+              f"{threading.active_count() - threads} watcher threads for {projects + 1} projects")
+        
+        start = time.monotonic()
+        supervisor.poll()
+        print(f"Baseline poll: {supervisor.metrics()['polled_files']} files in {time.monotonic() - start:.1f}s")
+        
+        for path in touched:
+            path.write_text('changed')
+        for unit, (_, interval) in supervisor.poll_schedule.items():
+            supervisor.poll_schedule[unit] = (0, interval)
+        time.sleep(2)
+        start = time.monotonic()
+        for path in supervisor.poll():
+            handler._stage_change(path)
+        print(f"Second poll took {time.monotonic() - start:.1f}s")
+        
+        seen = {repo.name for repo in handler.pending_changes}
+        print(f"Changes seen in: {sorted(seen)}")
+        handler.pending_changes.clear()
+        handler.request_rescan(wide_root)
+        print(f"A lost watch on a root rescans {len(handler.pending_changes)} repos")
+        try:
+            import resource
+            print(f"Peak memory: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024} MB")
+        except ImportError:
+            pass
+        return seen == {'huge', 'project000'}
+    finally:
+        observer.stop()
+        observer.join()
+        for path in touched:
+            path.write_text('')
+        if original_limit:
+            limit_file.write_text(original_limit)
+
+def _split_options(args, names):
+    positional, options = [], {}
+    i = 0
+    while i < len(args):
+        if args[i] in names and i + 1 < len(args):
+            options[args[i][2:]] = args[i + 1]
+            i += 2
+        else:
+            positional.append(args[i])
+            i += 1
+    return positional, options
 
 def main():
-    if sys.platform != 'win32':
+    # The replay harness, service mode and watch benchmark run on any platform, so they can be tried on Linux
+    portable = len(sys.argv) > 1 and sys.argv[1].lower() in ('replay', 'service', 'bench-watches')
+    if sys.platform != 'win32' and not portable:
         print("This script is designed for Windows. Use the standard version for other platforms.")
         sys.exit(1)
     
@@ -499,6 +3195,16 @@ def main():
         print("  python git_backup.py status")
         print("  python git_backup.py remote <project_name> <remote_url>")
         print("  python git_backup.py backup-all")
+        print("  python git_backup.py find <project_name> [--file PATH] [--since TIME] [--until TIME]")
+        print("  python git_backup.py restore <project_name> <path> [--at TIME] [--to DIR]")
+        print("  python git_backup.py metrics")
+        print("  python git_backup.py audit [project_name] [--since TIME] [--until TIME] [--failed]")
+        print("  python git_backup.py replicate [project_name] [--to DIR]")
+        print("  python git_backup.py record <trace_file> [seconds]")
+        print("  python git_backup.py replay <trace_file> <work_dir> [--speed N] [--interval SECONDS]")
+        print("  python git_backup.py bench-startup [runs]")
+        print("  python git_backup.py bench-watches <work_dir> [--files N] [--projects N] [--max-watches N]")
+        print("  python git_backup.py service --home DIR [--home DIR ...]")
         print("  python git_backup.py stop")
         sys.exit(1)
     
@@ -527,6 +3233,109 @@ def main():
     elif command == 'backup-all':
         manager.force_backup_all()
     
+    elif command == 'find':
+        args, options = _split_options(sys.argv[2:], ('--file', '--since', '--until'))
+        if len(args) != 1:
+            print("Usage: python git_backup.py find <project_name> [--file PATH] [--since TIME] [--until TIME]")
+            sys.exit(1)
+        try:
+            since = parse_time(options['since']) if 'since' in options else None
+            until = parse_time(options['until']) if 'until' in options else None
+        except ValueError as e:
+            print(f"Invalid time: {e}")
+            sys.exit(1)
+        if manager.find_snapshots(args[0], options.get('file'), since, until) is None:
+            sys.exit(1)
+    
+    elif command == 'restore':
+        args, options = _split_options(sys.argv[2:], ('--at', '--to'))
+        if len(args) != 2:
+            print("Usage: python git_backup.py restore <project_name> <path> [--at TIME] [--to DIR]")
+            sys.exit(1)
+        try:
+            at = parse_time(options['at']) if 'at' in options else None
+        except ValueError as e:
+            print(f"Invalid time: {e}")
+            sys.exit(1)
+        if not manager.restore(args[0], args[1], at, options.get('to')):
+            sys.exit(1)
+    
+    elif command == 'metrics':
+        if not manager.show_metrics():
+            sys.exit(1)
+    
+    elif command == 'audit':
+        failed_only = '--failed' in sys.argv
+        args, options = _split_options([arg for arg in sys.argv[2:] if arg != '--failed'], ('--since', '--until'))
+        if len(args) > 1:
+            print("Usage: python git_backup.py audit [project_name] [--since TIME] [--until TIME] [--failed]")
+            sys.exit(1)
+        try:
+            since = parse_time(options['since']) if 'since' in options else None
+            until = parse_time(options['until']) if 'until' in options else None
+        except ValueError as e:
+            print(f"Invalid time: {e}")
+            sys.exit(1)
+        if not manager.show_audit(args[0] if args else None, since, until, failed_only):
+            sys.exit(1)
+    
+    elif command == 'replicate':
+        args, options = _split_options(sys.argv[2:], ('--to',))
+        if len(args) > 1:
+            print("Usage: python git_backup.py replicate [project_name] [--to DIR]")
+            sys.exit(1)
+        if not manager.replicate(args[0] if args else None, options.get('to')):
+            sys.exit(1)
+    
+    elif command == 'record':
+        if len(sys.argv) not in (3, 4):
+            print("Usage: python git_backup.py record <trace_file> [seconds]")
+            sys.exit(1)
+        duration = float(sys.argv[3]) if len(sys.argv) > 3 else None
+        if not manager.record(sys.argv[2], duration):
+            sys.exit(1)
+    
+    elif command == 'replay':
+        args, options = _split_options(sys.argv[2:], ('--speed', '--interval'))
+        if len(args) != 2:
+            print("Usage: python git_backup.py replay <trace_file> <work_dir> [--speed N] [--interval SECONDS]")
+            print("  --speed 0 feeds events as fast as possible")
+            sys.exit(1)
+        try:
+            replay_trace(args[0], args[1], float(options.get('speed', 1)), int(options.get('interval', 10)))
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Replay failed: {e}")
+            sys.exit(1)
+    
+    elif command == 'service':
+        args = sys.argv[2:]
+        homes = [args[i + 1] for i, arg in enumerate(args[:-1]) if arg == '--home']
+        if not homes or len(homes) * 2 != len(args):
+            print("Usage: python git_backup.py service --home DIR [--home DIR ...]")
+            sys.exit(1)
+        if not BackupService(homes).run():
+            sys.exit(1)
+    
+    elif command == 'bench-startup':
+        runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+        if not bench_startup(runs):
+            sys.exit(1)
+    
+    elif command == 'bench-watches':
+        args, options = _split_options(sys.argv[2:], ('--files', '--projects', '--max-watches'))
+        if len(args) != 1:
+            print("Usage: python git_backup.py bench-watches <work_dir> [--files N] [--projects N] [--max-watches N]")
+            print("  --max-watches lowers the Linux inotify limit for the run and needs root")
+            sys.exit(1)
+        try:
+            passed = bench_watches(args[0], int(options.get('files', 1000000)), int(options.get('projects', 50)),
+                                   int(options['max-watches']) if 'max-watches' in options else None)
+        except (OSError, ValueError) as e:
+            print(f"Benchmark failed: {e}")
+            sys.exit(1)
+        if not passed:
+            sys.exit(1)
+    
     elif command == 'stop':
         print("Stopping any running instances...")
         # This is a placeholder - in practice you'd need IPC or process management
@@ -2,11 +2,13 @@
 import os
 import sys
 import json
+import csv
+import shutil
 import subprocess
 import winreg
 from pathlib import Path
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 from datetime import datetime
 
 class GitBackupServiceManager:
@@ -150,6 +152,7 @@ class GitBackupGUI:
         ttk.Button(buttons_frame, text="Refresh", command=self.refresh_projects).pack(side='left', padx=5)
         ttk.Button(buttons_frame, text="Add Remote", command=self.add_remote).pack(side='left', padx=5)
         ttk.Button(buttons_frame, text="Force Backup", command=self.force_backup).pack(side='left', padx=5)
+        ttk.Button(buttons_frame, text="Restore...", command=self.restore_files).pack(side='left', padx=5)
         ttk.Button(buttons_frame, text="Open Folder", command=self.open_project_folder).pack(side='left', padx=5)
     
     def setup_control_tab(self, parent):
@@ -188,7 +191,8 @@ class GitBackupGUI:
                 extensions = config.get('excluded_extensions', ['.exe', '.dll', '.bin', '.iso'])
                 self.extensions_var.set(','.join(extensions))
                 
-                if 'projects_path' in config:
+                # An empty value means the default folder, which the field already shows
+                if config.get('projects_path'):
                     self.projects_path_var.set(config['projects_path'])
         except Exception as e:
             self.log_message(f"Error loading config: {e}")
@@ -196,13 +200,29 @@ class GitBackupGUI:
     def save_config(self):
         """Save configuration to file"""
         try:
-            config = {
+            # Merge into the existing file so daemon-only settings survive
+            config = {}
+            if self.config_file.exists():
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config = json.load(f)
+            config.update({
                 'backup_interval': int(self.interval_var.get()),
                 'auto_push': self.auto_push_var.get(),
                 'max_file_size_mb': int(self.max_size_var.get()),
-                'excluded_extensions': [ext.strip() for ext in self.extensions_var.get().split(',')],
+                'excluded_extensions': [ext.strip() for ext in self.extensions_var.get().split(',') if ext.strip()],
                 'projects_path': self.projects_path_var.get()
-            }
+            })
+            if not config['projects_path']:
+                del config['projects_path']
+            
+            # The daemon rejects the whole file over one bad value, so never write one
+            from git_backup import BackupConfig
+            try:
+                BackupConfig.from_dict(config)
+            except ValueError as e:
+                messagebox.showerror("Invalid configuration", f"Not saved: {e}")
+                self.log_message(f"Config not saved: {e}")
+                return
             
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=2)
@@ -234,13 +254,20 @@ class GitBackupGUI:
             return
         
         try:
+            from git_backup import AuditLog, audit_directory
+            attempts = AuditLog(audit_directory(Path.home())).latest()
+            
             for project_dir in self.projects_path.iterdir():
                 if project_dir.is_dir() and not project_dir.name.startswith('.'):
                     git_dir = project_dir / '.git'
                     status = "Git repo" if git_dir.exists() else "Not initialized"
                     
-                    # Get last backup time (placeholder)
+                    # Last backup attempt from the daemon's audit log
+                    attempt = attempts.get(str(project_dir.resolve()))
                     last_backup = "Never"
+                    if attempt:
+                        when = datetime.fromtimestamp(attempt['time']).strftime('%Y-%m-%d %H:%M')
+                        last_backup = f"{when} ({attempt['result']})"
                     
                     self.projects_tree.insert('', 'end', text=project_dir.name, 
                                            values=(status, last_backup))
@@ -305,6 +332,42 @@ class GitBackupGUI:
             except Exception as e:
                 self.log_message(f"Error during backup: {e}")
     
+    def restore_files(self):
+        """Restore a file or folder of the selected project from a backup"""
+        selection = self.projects_tree.selection()
+        if not selection:
+            messagebox.showwarning("Warning", "Please select a project first")
+            return
+        
+        project_name = self.projects_tree.item(selection[0])['text']
+        path = simpledialog.askstring("Restore",
+                                      f"File or folder to restore in {project_name} (relative path):")
+        if not path:
+            return
+        at = simpledialog.askstring("Restore",
+                                    "Restore as of (e.g. 2024-05-01 14:30, or 2h for two hours ago):",
+                                    initialvalue=datetime.now().strftime('%Y-%m-%d %H:%M'))
+        if not at:
+            return
+        if not messagebox.askyesno("Restore", f"Overwrite '{path}' in {project_name} with the backup from {at}?"):
+            return
+        
+        try:
+            result = subprocess.run([
+                sys.executable, "git_backup.py", "restore", project_name, path, "--at", at
+            ], capture_output=True, text=True, cwd=Path(__file__).parent)
+            
+            if result.returncode == 0:
+                messagebox.showinfo("Success", f"Restored '{path}' in {project_name}")
+                self.log_message(result.stderr.strip() or f"Restored {path} in {project_name}")
+            else:
+                messagebox.showerror("Error", f"Restore failed: {result.stderr}")
+                self.log_message(f"Error restoring {path}: {result.stderr}")
+                
+        except Exception as e:
+            messagebox.showerror("Error", f"Restore failed: {e}")
+            self.log_message(f"Error restoring {path}: {e}")
+    
     def open_project_folder(self):
         """Open selected project folder in Explorer"""
         selection = self.projects_tree.selection()
@@ -419,15 +482,137 @@ def check_admin_rights():
     except:
         return False
 
-def install_service():
-    """Install as Windows service (advanced)"""
-    print("Service installation not implemented in this version")
-    print("Use the GUI or startup entry for automatic starting")
+SERVICE_TASK = 'GitBackupService'
+PROFILE_LIST_KEY = r'SOFTWARE\Microsoft\Windows NT\CurrentVersion\ProfileList'
+
+def _profile_accounts():
+    """Map each local profile folder (normcased) to its DOMAIN\\user account"""
+    import win32security
+    accounts = {}
+    with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, PROFILE_LIST_KEY) as key:
+        for i in range(winreg.QueryInfoKey(key)[0]):
+            sid = winreg.EnumKey(key, i)
+            try:
+                with winreg.OpenKey(key, sid) as profile_key:
+                    path = os.path.expandvars(winreg.QueryValueEx(profile_key, 'ProfileImagePath')[0])
+                name, domain, _ = win32security.LookupAccountSid(None, win32security.ConvertStringSidToSid(sid))
+            except (OSError, win32security.error):
+                continue
+            accounts[os.path.normcase(os.path.abspath(path))] = f'{domain}\\{name}'
+    return accounts
+
+def _service_dir(home):
+    return Path(home) / 'AppData' / 'Local' / 'GitBackup' / 'service'
+
+def install_service(homes=None):
+    """Run the backup service for each profile at its user's logon, as that user"""
+    try:
+        accounts = _profile_accounts()
+    except (OSError, ImportError) as e:
+        print(f"Cannot read the local user profiles: {e}")
+        return False
+    if not homes:
+        # Every profile that has a projects folder
+        homes = [home for home in sorted(accounts) if (Path(home) / 'Desktop' / 'projects').is_dir()]
+    if not homes:
+        print("No user profiles with a Desktop\\projects folder found, pass them with --home")
+        return False
+    
+    # Earlier versions ran a single task as SYSTEM, which must not survive an upgrade
+    subprocess.run(['schtasks', '/Delete', '/TN', SERVICE_TASK, '/F'], capture_output=True, text=True)
+    
+    source = Path(__file__).with_name('git_backup.py')
+    python = os.path.normcase(str(Path(sys.executable).resolve()))
+    installed = []
+    for home in homes:
+        profile = os.path.normcase(os.path.abspath(home))
+        account = accounts.get(profile)
+        if not account:
+            print(f"Skipping {home}: no local account owns this profile")
+            continue
+        if any(python.startswith(other + os.sep) for other in accounts if other != profile):
+            print(f"Skipping {home}: {sys.executable} is inside another user's profile, "
+                  f"so that user could change what runs as {account}")
+            continue
+        
+        # The task runs a copy inside the user's own profile, which other users
+        # cannot write to; the command line is limited to 261 characters, so it
+        # goes through a batch file
+        service_dir = _service_dir(home)
+        bat_file = service_dir / 'GitBackupService.bat'
+        try:
+            service_dir.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, service_dir / 'git_backup.py')
+            bat_file.write_text(f'''@echo off
+cd /d "{service_dir}"
+"{sys.executable}" git_backup.py service --home "{home}"
+''')
+        except OSError as e:
+            print(f"Skipping {home}: {e}")
+            continue
+        
+        # /IT runs it in the user's own logon session, where their git
+        # credentials can be decrypted, and without elevation
+        user = account.rsplit('\\', 1)[-1]
+        task = f"{SERVICE_TASK}-{user}"
+        result = subprocess.run([
+            'schtasks', '/Create', '/TN', task, '/TR', f'"{bat_file}"',
+            '/SC', 'ONLOGON', '/RU', account, '/IT', '/F'
+        ], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Failed to install {task}: {result.stderr.strip() or result.stdout.strip()}")
+            continue
+        installed.append((task, account, home))
+    
+    if not installed:
+        return False
+    print("Installed scheduled tasks, each starting when its user logs on:")
+    for task, account, home in installed:
+        print(f"  {task}  as {account}  for {home}")
+    print("Run install-service again after updating git_backup.py so the copies are refreshed")
+    print("Remove per-user startup entries so projects are not watched twice")
+    return True
+
+def uninstall_service():
+    """Remove the scheduled tasks created by install_service"""
+    result = subprocess.run(['schtasks', '/Query', '/FO', 'CSV', '/NH'], capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"Failed to list scheduled tasks: {result.stderr.strip() or result.stdout.strip()}")
+        return False
+    names = {row[0].lstrip('\\') for row in csv.reader(result.stdout.splitlines()) if row}
+    tasks = sorted(name for name in names if name == SERVICE_TASK or name.startswith(SERVICE_TASK + '-'))
+    
+    removed = True
+    for task in tasks:
+        result = subprocess.run(['schtasks', '/Delete', '/TN', task, '/F'], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Failed to remove {task}: {result.stderr.strip() or result.stdout.strip()}")
+            removed = False
+        else:
+            print(f"Removed scheduled task {task}")
+    if not tasks:
+        print("No Git Backup service tasks are installed")
+    
+    bat_file = Path(__file__).parent / 'GitBackupService.bat'
+    if bat_file.exists():
+        bat_file.unlink()
+    try:
+        for home in _profile_accounts():
+            shutil.rmtree(_service_dir(home), ignore_errors=True)
+    except (OSError, ImportError):
+        pass
+    return removed
 
 def main():
     if len(sys.argv) > 1:
         if sys.argv[1] == 'install-service':
-            install_service()
+            args = sys.argv[2:]
+            homes = [args[i + 1] for i, arg in enumerate(args[:-1]) if arg == '--home']
+            if not install_service(homes):
+                sys.exit(1)
+        elif sys.argv[1] == 'uninstall-service':
+            if not uninstall_service():
+                sys.exit(1)
         elif sys.argv[1] == 'gui':
             app = GitBackupGUI()
             app.run()